@@ -10,8 +10,10 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.1/ref/settings/
 """
 
+import os
 from pathlib import Path
 from datetime import timedelta
+from django.core.exceptions import ImproperlyConfigured
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -46,6 +48,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'api.middleware.MetricsMiddleware',
+    'api.profiling.ProfilingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -80,12 +84,65 @@ WSGI_APPLICATION = 'DiagonalDuelBackend.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.1/ref/settings/#databases
 
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+# DATABASE_PROFILE selects the database layer:
+#   'sqlite'        - local file with WAL journaling, a busy timeout and IMMEDIATE transactions so
+#                     concurrent writers queue for the lock instead of failing with "database is locked"
+#   'sqlite-legacy' - the previous untuned SQLite setup, kept for benchmarking
+#   'postgresql'    - persistent connections, or a psycopg connection pool when DATABASE_POOL_MAX_SIZE is set
+DATABASE_PROFILE = os.environ.get('DATABASE_PROFILE', 'sqlite')
+if DATABASE_PROFILE not in ('sqlite', 'sqlite-legacy', 'postgresql'):
+    raise ImproperlyConfigured(
+        f"DATABASE_PROFILE must be 'sqlite', 'sqlite-legacy' or 'postgresql', not {DATABASE_PROFILE!r}."
+    )
+
+if DATABASE_PROFILE == 'postgresql':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': os.environ.get('DATABASE_NAME', 'diagonalduel'),
+            'USER': os.environ.get('DATABASE_USER', ''),
+            'PASSWORD': os.environ.get('DATABASE_PASSWORD', ''),
+            'HOST': os.environ.get('DATABASE_HOST', ''),
+            'PORT': os.environ.get('DATABASE_PORT', ''),
+            'CONN_MAX_AGE': int(os.environ.get('DATABASE_CONN_MAX_AGE', 600)),
+            'CONN_HEALTH_CHECKS': True,
+            'OPTIONS': {},
+        }
+    }
+    if os.environ.get('DATABASE_POOL_MAX_SIZE'):
+        # Pooling replaces persistent connections (requires psycopg[pool]).
+        DATABASES['default']['CONN_MAX_AGE'] = 0
+        DATABASES['default']['OPTIONS']['pool'] = {
+            'min_size': int(os.environ.get('DATABASE_POOL_MIN_SIZE', 2)),
+            'max_size': int(os.environ['DATABASE_POOL_MAX_SIZE']),
+            'timeout': int(os.environ.get('DATABASE_POOL_TIMEOUT', 10)),
+        }
+elif DATABASE_PROFILE == 'sqlite-legacy':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': os.environ.get('DATABASE_NAME', BASE_DIR / 'db.sqlite3'),
+        }
+    }
+else:
+    SQLITE_BUSY_TIMEOUT_MS = int(os.environ.get('SQLITE_BUSY_TIMEOUT_MS', 5000))
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': os.environ.get('DATABASE_NAME', BASE_DIR / 'db.sqlite3'),
+            'CONN_MAX_AGE': int(os.environ.get('DATABASE_CONN_MAX_AGE', 600)),
+            'OPTIONS': {
+                'timeout': SQLITE_BUSY_TIMEOUT_MS / 1000,
+                'transaction_mode': 'IMMEDIATE',
+                'init_command': (
+                    'PRAGMA journal_mode=WAL;'
+                    'PRAGMA synchronous=NORMAL;'
+                    f'PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS};'
+                    'PRAGMA temp_store=MEMORY;'
+                ),
+            },
+        }
     }
-}
 
 
 # Password validation
@@ -107,6 +164,32 @@ AUTH_PASSWORD_VALIDATORS = [
 ]
 
 
+# Password hashing profile: 'scrypt' (default), 'argon2' (needs argon2-cffi) or 'pbkdf2'.
+# The first hasher hashes new passwords; hashes made by the others, or with different parameters,
+# are upgraded transparently the next time their user logs in.
+PASSWORD_HASHING = {
+    'PROFILE': os.environ.get('PASSWORD_HASHING_PROFILE', 'scrypt'),
+    'WORKERS': int(os.environ.get('PASSWORD_HASHING_WORKERS', os.cpu_count() or 1)),
+    'PBKDF2_ITERATIONS': int(os.environ.get('PBKDF2_ITERATIONS', 870000)),
+    'SCRYPT_WORK_FACTOR': int(os.environ.get('SCRYPT_WORK_FACTOR', 2 ** 14)),
+    'SCRYPT_BLOCK_SIZE': int(os.environ.get('SCRYPT_BLOCK_SIZE', 8)),
+    'SCRYPT_PARALLELISM': int(os.environ.get('SCRYPT_PARALLELISM', 1)),
+    'ARGON2_TIME_COST': int(os.environ.get('ARGON2_TIME_COST', 2)),
+    'ARGON2_MEMORY_COST': int(os.environ.get('ARGON2_MEMORY_COST', 65536)),
+    'ARGON2_PARALLELISM': int(os.environ.get('ARGON2_PARALLELISM', 1)),
+}
+
+PASSWORD_HASHER_PROFILES = {
+    'scrypt': 'api.hashers.ScryptPasswordHasher',
+    'argon2': 'api.hashers.Argon2PasswordHasher',
+    'pbkdf2': 'api.hashers.PBKDF2PasswordHasher',
+}
+
+PASSWORD_HASHERS = [PASSWORD_HASHER_PROFILES[PASSWORD_HASHING['PROFILE']]] + [
+    hasher for profile, hasher in PASSWORD_HASHER_PROFILES.items() if profile != PASSWORD_HASHING['PROFILE']
+]
+
+
 # Internationalization
 # https://docs.djangoproject.com/en/5.1/topics/i18n/
 
@@ -140,3 +223,49 @@ SIMPLE_JWT = {
     'REFRESH_TOKEN_LIFETIME': timedelta(days=60),
     'ROTATE_REFRESH_TOKENS': False,
 }
+
+# Request metrics exposed at /metrics in Prometheus text format.
+# Lower QUERY_SAMPLE_RATE in production (METRICS_QUERY_SAMPLE_RATE) to instrument only a fraction of
+# requests' DB queries.
+# /metrics is served to clients in ALLOWED_IPS, to requests with `Authorization: Bearer <TOKEN>` when
+# TOKEN is set, and to staff users; everyone else gets 403.
+METRICS = {
+    'ENABLED': True,
+    'QUERY_SAMPLE_RATE': float(os.environ.get('METRICS_QUERY_SAMPLE_RATE', 1.0)),
+    'TOKEN': os.environ.get('METRICS_TOKEN', ''),
+    # Matched against REMOTE_ADDR; behind a reverse proxy that is the proxy's address.
+    'ALLOWED_IPS': [ip for ip in os.environ.get('METRICS_ALLOWED_IPS', '').split(',') if ip],
+}
+
+# Opt-in request profiling. SAMPLE_RATE requests run under cProfile; requests slower than
+# SLOW_REQUEST_THRESHOLD seconds are kept with their sampled stacks. Reports are written to a
+# ring buffer of at most MAX_PROFILES captures in DIRECTORY.
+PROFILING = {
+    'ENABLED': False,
+    'SAMPLE_RATE': 0.0,
+    'SLOW_REQUEST_THRESHOLD': None,
+    'SAMPLING_INTERVAL': 0.005,
+    'MAX_SQL_STATEMENTS': 500,
+    # Query parameters include password hashes and emails; only enable for local debugging.
+    'RECORD_SQL_PARAMS': False,
+    'DIRECTORY': BASE_DIR / 'profiles',
+    'MAX_PROFILES': 200,
+}
+
+# Precomputed early-game moves, built with `manage.py build_opening_book`.
+OPENING_BOOK_PATH = BASE_DIR / 'opening_book.bin'
+COMPUTER_MAX_DEPTH = 4
+# computer_points credited for beating the computer at each difficulty.
+COMPUTER_GAME_POINTS = {
+    'easy': 1,
+    'medium': 2,
+    'hard': 3,
+}
+
+# How long a read-model consumer waits on a missing GameEvent sequence number before treating it as
+# rolled back and moving past it. Under concurrent PostgreSQL transactions later sequence numbers can
+# commit first, so this must exceed the longest event-writing transaction (e.g. recompute_ratings).
+EVENT_CONSUMER_GAP_TIMEOUT = timedelta(minutes=5)
+
+# Active games whose board state each worker keeps in memory between moves.
+GAME_STATE_CACHE_SIZE = 1024
@@ -18,10 +18,12 @@ from django.contrib import admin
 from django.urls import path
 from django.conf.urls import include
 from rest_framework.authtoken.views import obtain_auth_token
+from api.views import MetricsView
 
 
 urlpatterns = [
     path('api/', include('api.urls')),
     path('admin/', admin.site.urls),
     path('auth/', obtain_auth_token),
+    path('metrics', MetricsView.as_view(), name='metrics'),
 ]
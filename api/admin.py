@@ -1,8 +1,13 @@
 from django.contrib import admin
-from .models import CustomUser, Game, Move, MatchmakingQueue
+from .models import CustomUser, Game, Move, MatchmakingQueue, UserStats, GameEvent, EventConsumerCheckpoint, LeaderboardEntry, ComputerGame
 
 
 admin.site.register(CustomUser)
 admin.site.register(Game)
 admin.site.register(Move)
 admin.site.register(MatchmakingQueue)
+admin.site.register(UserStats)
+admin.site.register(GameEvent)
+admin.site.register(EventConsumerCheckpoint)
+admin.site.register(LeaderboardEntry)
+admin.site.register(ComputerGame)
@@ -0,0 +1,243 @@
+"""
+Database-free Diagonal Duel engine.
+
+Positions are two 64-bit bitboards, one per side, with cell index `row * 8 + column`. Side 0 is the
+player who moves first (a game's player1). A cell can be played if it is empty and is on row 0 or
+column 0, or if the cell above, to the left or diagonally above-left is occupied. Four in a row
+horizontally, vertically or diagonally wins.
+
+This module has no Django dependency so it can be imported by worker processes and offline tools.
+"""
+SIZE = 8
+CELLS = SIZE * SIZE
+# Wins score WIN_SCORE minus the ply they happen on, which always beats the heuristic bound.
+WIN_SCORE = 127
+HEURISTIC_BOUND = 50
+LINE_WEIGHTS = (0, 1, 4, 16, 0)
+
+
+def cell_index(row, column):
+    return row * SIZE + column
+
+
+def cell_coordinates(cell):
+    return divmod(cell, SIZE)
+
+
+def _build_lines():
+    lines = []
+    for row in range(SIZE):
+        for column in range(SIZE):
+            for d_row, d_column in ((0, 1), (1, 0), (1, 1), (1, -1)):
+                end_row, end_column = row + 3 * d_row, column + 3 * d_column
+                if 0 <= end_row < SIZE and 0 <= end_column < SIZE:
+                    mask = 0
+                    for k in range(4):
+                        mask |= 1 << cell_index(row + k * d_row, column + k * d_column)
+                    lines.append(mask)
+    return tuple(lines)
+
+
+def _build_support():
+    support = []
+    for row in range(SIZE):
+        for column in range(SIZE):
+            if row == 0 or column == 0:
+                support.append(0)
+            else:
+                support.append(
+                    (1 << cell_index(row - 1, column))
+                    | (1 << cell_index(row - 1, column - 1))
+                    | (1 << cell_index(row, column - 1))
+                )
+    return tuple(support)
+
+
+LINES = _build_lines()
+LINES_THROUGH = tuple(tuple(line for line in LINES if line >> cell & 1) for cell in range(CELLS))
+# Cells on row 0 or column 0 need no support and have a support mask of 0.
+SUPPORT = _build_support()
+# Cells ordered from the centre outwards, used to order the search.
+CENTRE_ORDER = tuple(sorted(range(CELLS), key=lambda c: abs(c // SIZE - 3.5) + abs(c % SIZE - 3.5)))
+
+
+def transpose(mask):
+    """
+    Mirror a bitboard across the main diagonal. The placement rule and win lines are symmetric under
+    this mapping, so a position and its transpose have the same value.
+    """
+    result = 0
+    while mask:
+        low = mask & -mask
+        cell = low.bit_length() - 1
+        result |= 1 << ((cell % SIZE) * SIZE + cell // SIZE)
+        mask ^= low
+    return result
+
+
+def transpose_cell(cell):
+    return (cell % SIZE) * SIZE + cell // SIZE
+
+
+class Position:
+    __slots__ = ('masks', 'ply', 'winner')
+
+    def __init__(self, first=0, second=0, ply=None, winner=None):
+        self.masks = [first, second]
+        self.ply = bin(first | second).count('1') if ply is None else ply
+        self.winner = winner
+
+    @classmethod
+    def from_moves(cls, moves):
+        """
+        Replay (row, column) pairs from the empty board.
+        :raises ValueError: If a move is off the board, unsupported, occupied or played after the game ended
+        """
+        position = cls()
+        for row, column in moves:
+            if not (0 <= row < SIZE and 0 <= column < SIZE):
+                raise ValueError(f"Move ({row}, {column}) is off the board.")
+            position.play_checked(cell_index(row, column))
+        return position
+
+    @property
+    def occupied(self):
+        return self.masks[0] | self.masks[1]
+
+    @property
+    def to_move(self):
+        return self.ply & 1
+
+    @property
+    def is_over(self):
+        return self.winner is not None or self.ply == CELLS
+
+    def key(self):
+        return self.masks[0], self.masks[1]
+
+    def copy(self):
+        return Position(self.masks[0], self.masks[1], self.ply, self.winner)
+
+    def is_legal(self, cell):
+        occupied = self.occupied
+        if occupied >> cell & 1:
+            return False
+        support = SUPPORT[cell]
+        return support == 0 or bool(occupied & support)
+
+    def legal_moves(self):
+        occupied = self.occupied
+        return [
+            cell for cell in CENTRE_ORDER
+            if not occupied >> cell & 1 and (SUPPORT[cell] == 0 or occupied & SUPPORT[cell])
+        ]
+
+    def play(self, cell):
+        """
+        Play a move assumed to be legal. Returns True if it wins the game.
+        """
+        side = self.ply & 1
+        mask = self.masks[side] | (1 << cell)
+        self.masks[side] = mask
+        self.ply += 1
+        for line in LINES_THROUGH[cell]:
+            if mask & line == line:
+                self.winner = side
+                return True
+        return False
+
+    def play_checked(self, cell):
+        if self.is_over:
+            raise ValueError("The game is already over.")
+        if not self.is_legal(cell):
+            row, column = cell_coordinates(cell)
+            raise ValueError(f"Move ({row}, {column}) is not allowed.")
+        return self.play(cell)
+
+    def undo(self, cell):
+        self.ply -= 1
+        self.masks[self.ply & 1] &= ~(1 << cell)
+        self.winner = None
+
+    def wins_at(self, cell, side):
+        mask = self.masks[side] | (1 << cell)
+        for line in LINES_THROUGH[cell]:
+            if mask & line == line:
+                return True
+        return False
+
+    def evaluate(self):
+        """
+        Heuristic score from the side to move's perspective: open lines weighted by stone count.
+        """
+        own, other = self.masks[self.ply & 1], self.masks[(self.ply & 1) ^ 1]
+        score = 0
+        for line in LINES:
+            if line & other == 0:
+                score += LINE_WEIGHTS[bin(line & own).count('1')]
+            elif line & own == 0:
+                score -= LINE_WEIGHTS[bin(line & other).count('1')]
+        return max(-HEURISTIC_BOUND, min(HEURISTIC_BOUND, score // 4))
+
+
+def negamax(position, depth, alpha=-WIN_SCORE - 1, beta=WIN_SCORE + 1):
+    """
+    Alpha-beta search. Returns (score, cell) from the side to move's perspective; cell is None at leaves.
+    Quicker wins score higher, so the search prefers them.
+    """
+    moves = position.legal_moves()
+    if not moves:
+        return 0, None
+    side = position.to_move
+    for cell in moves:
+        if position.wins_at(cell, side):
+            return WIN_SCORE - position.ply - 1, cell
+    if depth == 0:
+        return position.evaluate(), None
+
+    best_score, best_cell = -WIN_SCORE - 1, moves[0]
+    for cell in moves:
+        position.play(cell)
+        score = -negamax(position, depth - 1, -beta, -alpha)[0]
+        position.undo(cell)
+        if score > best_score:
+            best_score, best_cell = score, cell
+        alpha = max(alpha, score)
+        if alpha >= beta:
+            break
+    return best_score, best_cell
+
+
+def best_move(position, depth):
+    """
+    :return: (cell, score) for the side to move, or (None, 0) if the game is over
+    """
+    if position.is_over:
+        return None, 0
+    score, cell = negamax(position, max(depth, 1))
+    return cell, score
+
+
+def best_moves(position, depth):
+    """
+    Every move sharing the best score, for callers that pick among equally good moves.
+    :return: ([cell, ...], score) for the side to move, or ([], 0) if the game is over
+    """
+    cell, score = best_move(position, depth)
+    if cell is None:
+        return [], 0
+    cells = [cell]
+    depth = max(depth, 1)
+    for other in position.legal_moves():
+        if other == cell:
+            continue
+        # Null-window test: fails low (at most -score) exactly when `other` also scores `score`.
+        position.play(other)
+        if position.winner is not None:
+            reply = -(WIN_SCORE - position.ply)
+        else:
+            reply = negamax(position, depth - 1, -score, -score + 1)[0]
+        position.undo(other)
+        if reply <= -score:
+            cells.append(other)
+    return cells, score
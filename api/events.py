@@ -0,0 +1,159 @@
+from django.conf import settings
+from django.db import transaction
+from django.utils.timezone import now
+from .models import CustomUser, EventConsumerCheckpoint, GameEvent, LeaderboardEntry, VersionCounter
+from .services import VersionService
+
+
+class EventConsumer:
+    """
+    Builds a read model from the GameEvent log. Each batch is applied in the same transaction that
+    advances the consumer's checkpoint, so a consumer can be stopped at any point and resumed, and
+    `reset` followed by `run` replays the whole log.
+
+    Events are applied strictly in sequence order. A missing sequence number may belong to a
+    transaction that has not committed yet, so the consumer stops there and only moves past it once
+    it has stayed missing for EVENT_CONSUMER_GAP_TIMEOUT (a rolled-back insert never appears).
+    """
+    name = None
+    # Event kinds the read model depends on; None for every kind.
+    kinds = None
+
+    def handle(self, events):
+        raise NotImplementedError
+
+    def clear(self):
+        raise NotImplementedError
+
+    def run(self, batch_size=500):
+        """
+        Apply every pending event.
+        :return: The number of events applied
+        """
+        applied = 0
+        while True:
+            with transaction.atomic():
+                checkpoint, _ = EventConsumerCheckpoint.objects.select_for_update().get_or_create(name=self.name)
+                events = list(
+                    GameEvent.objects.filter(sequence__gt=checkpoint.last_sequence).order_by('sequence')[:batch_size]
+                )
+                contiguous = []
+                for event in events:
+                    if event.sequence != checkpoint.last_sequence + len(contiguous) + 1:
+                        break
+                    contiguous.append(event)
+
+                if contiguous:
+                    self.handle(contiguous)
+                    checkpoint.last_sequence = contiguous[-1].sequence
+                    checkpoint.gap_detected_at = None
+                elif not events:
+                    return applied
+                elif checkpoint.gap_detected_at is None:
+                    checkpoint.gap_detected_at = now()
+                    checkpoint.save()
+                    return applied
+                elif now() - checkpoint.gap_detected_at < settings.EVENT_CONSUMER_GAP_TIMEOUT:
+                    return applied
+                else:
+                    checkpoint.last_sequence = events[0].sequence - 1
+                    checkpoint.gap_detected_at = None
+                checkpoint.save()
+            applied += len(contiguous)
+
+    def latest_pending(self):
+        """
+        :return: The sequence of the newest event of `kinds` the consumer has not applied yet, or None
+            when the read model is up to date
+        """
+        events = GameEvent.objects.all()
+        if self.kinds is not None:
+            events = events.filter(kind__in=self.kinds)
+        last_sequence = (
+            EventConsumerCheckpoint.objects.filter(name=self.name).values_list('last_sequence', flat=True).first() or 0
+        )
+        return events.filter(sequence__gt=last_sequence).order_by('-sequence').values_list('sequence', flat=True).first()
+
+    def reset(self):
+        with transaction.atomic():
+            self.clear()
+            EventConsumerCheckpoint.objects.filter(name=self.name).delete()
+
+
+class LeaderboardConsumer(EventConsumer):
+    """
+    Maintains LeaderboardEntry, which LeaderboardView serves, and bumps the leaderboard ETag version
+    whenever an entry changes.
+    """
+    name = 'leaderboard'
+    kinds = (
+        GameEvent.USER_REGISTERED, GameEvent.RATING_CHANGED, GameEvent.COMPUTER_POINTS_CHANGED,
+        GameEvent.GAME_WON, GameEvent.GAME_TIMED_OUT,
+    )
+
+    def handle(self, events):
+        user_ids = set()
+        for event in events:
+            if event.kind in (GameEvent.RATING_CHANGED, GameEvent.USER_REGISTERED, GameEvent.COMPUTER_POINTS_CHANGED):
+                user_ids.add(event.user_id)
+            elif event.kind in (GameEvent.GAME_WON, GameEvent.GAME_TIMED_OUT):
+                user_ids.update((event.payload['winner'], event.payload['loser']))
+        user_ids.discard(None)
+        if not user_ids:
+            return
+
+        # Users deleted since the event was written have no row left to attach an entry to.
+        entries = LeaderboardEntry.objects.in_bulk(user_ids)
+        users = CustomUser.objects.filter(id__in=user_ids - entries.keys()).values_list(
+            'id', 'username', 'computer_points', 'online_rating'
+        )
+        for user_id, username, computer_points, online_rating in users:
+            entries[user_id] = LeaderboardEntry(
+                user_id=user_id, username=username, computer_points=computer_points, online_rating=online_rating
+            )
+
+        for event in events:
+            if event.kind == GameEvent.USER_REGISTERED and event.user_id in entries:
+                entry = entries[event.user_id]
+                entry.username = event.payload['username']
+                entry.computer_points = event.payload['computer_points']
+                entry.online_rating = event.payload['online_rating']
+            elif event.kind == GameEvent.RATING_CHANGED and event.user_id in entries:
+                entries[event.user_id].online_rating = event.payload['new_rating']
+            elif event.kind == GameEvent.COMPUTER_POINTS_CHANGED and event.user_id in entries:
+                entries[event.user_id].computer_points = event.payload['new_points']
+            elif event.kind in (GameEvent.GAME_WON, GameEvent.GAME_TIMED_OUT):
+                for user_id in (event.payload['winner'], event.payload['loser']):
+                    if user_id in entries:
+                        entries[user_id].games_played += 1
+                if event.payload['winner'] in entries:
+                    entries[event.payload['winner']].wins += 1
+        if not entries:
+            return
+
+        LeaderboardEntry.objects.bulk_create(
+            entries.values(),
+            update_conflicts=True,
+            unique_fields=['user'],
+            update_fields=['username', 'computer_points', 'online_rating', 'games_played', 'wins'],
+        )
+        VersionService.bump(VersionCounter.LEADERBOARD)
+
+    def clear(self):
+        LeaderboardEntry.objects.all().delete()
+        VersionService.bump(VersionCounter.LEADERBOARD)
+
+
+CONSUMERS = {consumer.name: consumer for consumer in (LeaderboardConsumer,)}
+
+
+def run_consumers_on_commit(kind=None):
+    """
+    Apply new events to every read model that depends on `kind` (every read model when None) once the
+    current transaction commits. run_event_consumers remains the fallback for events this misses, e.g.
+    when the consumer stopped at a sequence gap; a failing consumer is logged and does not fail the
+    request that wrote the event.
+    """
+    for consumer in CONSUMERS.values():
+        if kind is None or consumer.kinds is None or kind in consumer.kinds:
+            transaction.on_commit(consumer().run, robust=True)
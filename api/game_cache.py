@@ -0,0 +1,85 @@
+import threading
+from collections import OrderedDict
+from django.conf import settings
+from .metrics import registry
+
+
+class GameState:
+    """
+    Board position of an active game as of `version` (Game.version). Turn and move count are derived
+    from the position: side 0 (player1) moves when the ply is even.
+    """
+    __slots__ = ('version', 'position')
+
+    def __init__(self, version, position):
+        self.version = version
+        self.position = position
+
+    @property
+    def move_count(self):
+        return self.position.ply
+
+
+class GameStateCache:
+    """
+    Bounded, per-process LRU cache of active games' state keyed by game id. Entries are only returned
+    when their version matches the Game row just read, so moves made by other workers are detected and
+    the stale entry is dropped.
+    """
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.stale = 0
+        self.evictions = 0
+
+    def get(self, game):
+        """
+        :return: A private copy of the cached state, safe to advance, or None
+        """
+        with self._lock:
+            state = self._entries.get(game.id)
+            if state is None:
+                self.misses += 1
+                return None
+            if state.version != game.version:
+                del self._entries[game.id]
+                self.stale += 1
+                return None
+            self._entries.move_to_end(game.id)
+            self.hits += 1
+            return GameState(state.version, state.position.copy())
+
+    def put(self, game_id, state):
+        with self._lock:
+            self._entries[game_id] = state
+            self._entries.move_to_end(game_id)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def metric_lines(self):
+        with self._lock:
+            counters = (
+                ('hits', self.hits, 'Move requests served from the cached game state.'),
+                ('misses', self.misses, 'Move requests for games not in the cache.'),
+                ('stale', self.stale, 'Cached game states dropped because the game version changed.'),
+                ('evictions', self.evictions, 'Game states evicted to respect the size bound.'),
+            )
+            size = len(self._entries)
+        lines = []
+        for name, value, documentation in counters:
+            metric = f"diagonalduel_game_state_cache_{name}_total"
+            lines += [f"# HELP {metric} {documentation}", f"# TYPE {metric} counter", f"{metric} {value}"]
+        lines += [
+            "# HELP diagonalduel_game_state_cache_size Game states currently cached.",
+            "# TYPE diagonalduel_game_state_cache_size gauge",
+            f"diagonalduel_game_state_cache_size {size}",
+        ]
+        return lines
+
+
+game_state_cache = GameStateCache(settings.GAME_STATE_CACHE_SIZE)
+registry.register_collector(game_state_cache.metric_lines)
@@ -0,0 +1,68 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
+from django.contrib.auth import hashers
+
+
+_pool = None
+_pool_lock = threading.Lock()
+_worker = threading.local()
+
+
+def _run_in_pool(function, *args):
+    """
+    Run a hashing call on the shared worker pool and wait for it. Calls made from inside a worker
+    (e.g. scrypt's verify re-encoding) run inline so nested hashing can never wait on a full pool.
+    """
+    global _pool
+    if getattr(_worker, 'active', False):
+        return function(*args)
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ThreadPoolExecutor(
+                    max_workers=settings.PASSWORD_HASHING['WORKERS'], thread_name_prefix='password-hashing'
+                )
+    return _pool.submit(_run_as_worker, function, *args).result()
+
+
+def _run_as_worker(function, *args):
+    _worker.active = True
+    try:
+        return function(*args)
+    finally:
+        _worker.active = False
+
+
+class PooledHasherMixin:
+    """
+    Runs encode/verify on a bounded pool of PASSWORD_HASHING['WORKERS'] threads. The underlying
+    hashlib and argon2 calls release the GIL, so hashes run in parallel up to the pool size and a
+    login burst queues for a worker instead of oversubscribing the CPU and memory.
+    """
+    def encode(self, password, salt, *args):
+        return _run_in_pool(super().encode, password, salt, *args)
+
+    def verify(self, password, encoded):
+        return _run_in_pool(super().verify, password, encoded)
+
+
+class PBKDF2PasswordHasher(PooledHasherMixin, hashers.PBKDF2PasswordHasher):
+    iterations = settings.PASSWORD_HASHING['PBKDF2_ITERATIONS']
+
+
+class ScryptPasswordHasher(PooledHasherMixin, hashers.ScryptPasswordHasher):
+    work_factor = settings.PASSWORD_HASHING['SCRYPT_WORK_FACTOR']
+    block_size = settings.PASSWORD_HASHING['SCRYPT_BLOCK_SIZE']
+    parallelism = settings.PASSWORD_HASHING['SCRYPT_PARALLELISM']
+    # scrypt needs 128 * r * N bytes; leave headroom over OpenSSL's 32 MiB default limit.
+    maxmem = 256 * work_factor * block_size
+
+
+class Argon2PasswordHasher(PooledHasherMixin, hashers.Argon2PasswordHasher):
+    """
+    Requires the optional argon2-cffi package.
+    """
+    time_cost = settings.PASSWORD_HASHING['ARGON2_TIME_COST']
+    memory_cost = settings.PASSWORD_HASHING['ARGON2_MEMORY_COST']
+    parallelism = settings.PASSWORD_HASHING['ARGON2_PARALLELISM']
@@ -0,0 +1,50 @@
+from datetime import timedelta
+from itertools import groupby
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils.timezone import now
+from api.models import Game, Move
+
+
+class Command(BaseCommand):
+    help = ("Pack the moves of completed games into Game.packed_moves and Game.packed_move_ids and delete "
+            "their Move rows.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--older-than-days', type=int, default=7,
+                            help="Only archive games last updated at least this many days ago.")
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        cutoff = now() - timedelta(days=options['older_than_days'])
+        batch_size = options['batch_size']
+        archived = 0
+
+        while True:
+            with transaction.atomic():
+                games = list(
+                    Game.objects.select_for_update()
+                    .filter(is_complete=True, packed_moves__isnull=True, updated_at__lte=cutoff)
+                    .order_by('id')[:batch_size]
+                )
+                if not games:
+                    break
+
+                moves = (
+                    Move.objects.filter(game_ref__in=games)
+                    .order_by('game_ref_id', 'move_order')
+                    .values_list('game_ref_id', 'id', 'row', 'column')
+                )
+                moves_by_game = {
+                    game_id: list(game_moves) for game_id, game_moves in groupby(moves, key=lambda move: move[0])
+                }
+                for game in games:
+                    game_moves = moves_by_game.get(game.id, [])
+                    game.packed_moves = Game.pack_moves([(row, column) for _, _, row, column in game_moves])
+                    game.packed_move_ids = Game.pack_move_ids([move_id for _, move_id, _, _ in game_moves])
+                Game.objects.bulk_update(games, ['packed_moves', 'packed_move_ids'])
+                # Archived games are listed exactly as before, so the players' game list ETags stay valid.
+                Move.objects.filter(game_ref__in=games).delete()
+            archived += len(games)
+
+        self.stdout.write(self.style.SUCCESS(f"Archived {archived} games."))
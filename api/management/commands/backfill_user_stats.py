@@ -0,0 +1,55 @@
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from api.models import CustomUser, Game, UserStats
+from api.services import GameService, TIMEOUT_SUFFIX
+
+
+class Command(BaseCommand):
+    help = "Rebuild every UserStats row from the history of completed games."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        stats = {}
+        skipped = 0
+
+        # One transaction that first blocks StatsService.record_result: completions already holding
+        # UserStats rows commit before the games are read and are counted here, later ones wait and
+        # apply on top of the rebuilt rows. Completions stall while the command runs.
+        with transaction.atomic():
+            if connection.vendor == 'postgresql':
+                with connection.cursor() as cursor:
+                    cursor.execute(f'LOCK TABLE {UserStats._meta.db_table} IN EXCLUSIVE MODE')
+            # On SQLite this write takes the database lock.
+            UserStats.objects.all().delete()
+
+            games = (
+                Game.objects.filter(is_complete=True)
+                .order_by('completed_at', 'id')
+                .values_list('player1_id', 'player2_id', 'player1__username', 'player2__username', 'winner')
+            )
+            for player1_id, player2_id, player1_name, player2_name, winner in games.iterator(chunk_size=batch_size):
+                side = GameService.winner_side(winner, player1_name, player2_name)
+                if side is None:
+                    skipped += 1
+                    continue
+                winner_id, loser_id = (player1_id, player2_id) if side == 1 else (player2_id, player1_id)
+                by_timeout = winner.endswith(TIMEOUT_SUFFIX)
+                for user_id, won in ((winner_id, True), (loser_id, False)):
+                    if user_id is None:
+                        continue
+                    if user_id not in stats:
+                        stats[user_id] = UserStats(user_id=user_id)
+                    stats[user_id].record(won, by_timeout=by_timeout and not won)
+
+            ratings = CustomUser.objects.filter(id__in=stats.keys()).values_list('id', 'online_rating')
+            for user_id, online_rating in ratings.iterator(chunk_size=batch_size):
+                stats[user_id].rating_peak = max(stats[user_id].rating_peak, online_rating)
+
+            UserStats.objects.bulk_create(stats.values(), batch_size=batch_size)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Rebuilt stats for {len(stats)} users ({skipped} games with an unrecognised winner skipped)."
+        ))
@@ -0,0 +1,100 @@
+import queue
+import threading
+import time
+import uuid
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import OperationalError, close_old_connections, connection
+from api.engine import Position, cell_coordinates
+from api.models import CustomUser, Game
+from api.services import GameService
+
+
+class Command(BaseCommand):
+    help = ("Submit moves to many games from concurrent threads through GameService.make_move and report "
+            "throughput and lock errors for the configured DATABASE_PROFILE. Uses the configured database; "
+            "run `migrate` first and point DATABASE_NAME at a scratch database.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--games', type=int, default=32)
+        parser.add_argument('--moves', type=int, default=20, help="Moves played in each game.")
+        parser.add_argument('--threads', type=int, default=8)
+
+    def handle(self, *args, **options):
+        moves = non_winning_moves(options['moves'])
+        prefix = f"bench-{uuid.uuid4().hex[:8]}"
+        CustomUser.objects.bulk_create([
+            CustomUser(username=f"{prefix}-{index}", email=f"{prefix}-{index}@example.com")
+            for index in range(options['games'] * 2)
+        ])
+        users = list(CustomUser.objects.filter(username__startswith=prefix).order_by('id'))
+        games = [Game.objects.create(player1=users[2 * index], player2=users[2 * index + 1])
+                 for index in range(options['games'])]
+        connection.close()
+
+        pending = queue.Queue()
+        for game in games:
+            pending.put(game.id)
+        latencies = []
+        lock_errors = [0]
+        results_lock = threading.Lock()
+
+        def worker():
+            try:
+                while True:
+                    try:
+                        game_id = pending.get_nowait()
+                    except queue.Empty:
+                        return
+                    for row, column in moves:
+                        while True:
+                            start = time.perf_counter()
+                            try:
+                                game = Game.objects.select_related('player1', 'player2').get(id=game_id)
+                                GameService.make_move(game, game.get_turn(), row, column)
+                            except OperationalError:
+                                with results_lock:
+                                    lock_errors[0] += 1
+                                continue
+                            finally:
+                                # Mirrors the end of a request: closes the connection unless it is persistent.
+                                close_old_connections()
+                            with results_lock:
+                                latencies.append(time.perf_counter() - start)
+                            break
+            finally:
+                connection.close()
+
+        started = time.perf_counter()
+        threads = [threading.Thread(target=worker) for _ in range(options['threads'])]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+
+        Game.objects.filter(id__in=[game.id for game in games]).delete()
+        CustomUser.objects.filter(username__startswith=prefix).delete()
+
+        latencies.sort()
+        self.stdout.write(
+            f"profile={settings.DATABASE_PROFILE} threads={options['threads']} moves={len(latencies)} "
+            f"elapsed={elapsed:.2f}s throughput={len(latencies) / elapsed:.1f} moves/s "
+            f"p50={latencies[len(latencies) // 2] * 1000:.1f}ms "
+            f"p99={latencies[int(len(latencies) * 0.99)] * 1000:.1f}ms "
+            f"lock_errors={lock_errors[0]}"
+        )
+
+
+def non_winning_moves(count):
+    """
+    A legal move sequence of `count` moves in which neither side completes a line.
+    """
+    position = Position()
+    moves = []
+    while len(moves) < count:
+        side = position.to_move
+        cell = next(cell for cell in reversed(position.legal_moves()) if not position.wins_at(cell, side))
+        position.play(cell)
+        moves.append(cell_coordinates(cell))
+    return moves
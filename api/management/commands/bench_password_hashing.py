@@ -0,0 +1,51 @@
+import os
+import threading
+import time
+from django.conf import settings
+from django.contrib.auth.hashers import check_password, make_password
+from django.core.management.base import BaseCommand
+from django.utils.module_loading import import_string
+
+
+class Command(BaseCommand):
+    help = "Measure password checks (the CPU cost of a login) per second for each hashing profile."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--seconds', type=float, default=5.0)
+        parser.add_argument('--threads', type=int, default=(os.cpu_count() or 1) * 2,
+                            help="Concurrent simulated logins; defaults to twice the core count.")
+        parser.add_argument('--profile', action='append', choices=sorted(settings.PASSWORD_HASHER_PROFILES),
+                            help="Profile to benchmark; may be repeated. Defaults to every profile.")
+
+    def handle(self, *args, **options):
+        cores = os.cpu_count() or 1
+        self.stdout.write(f"{cores} cores, {settings.PASSWORD_HASHING['WORKERS']} hashing workers, "
+                          f"{options['threads']} concurrent logins")
+        for profile in options['profile'] or sorted(settings.PASSWORD_HASHER_PROFILES):
+            algorithm = import_string(settings.PASSWORD_HASHER_PROFILES[profile]).algorithm
+            try:
+                encoded = make_password('correct horse battery staple', hasher=algorithm)
+            except ValueError as e:
+                self.stdout.write(f"{profile:8} skipped: {e}")
+                continue
+            checks = self.run(encoded, options['threads'], options['seconds'])
+            per_second = checks / options['seconds']
+            self.stdout.write(f"{profile:8} {per_second:10.1f} logins/s  {per_second / cores:10.1f} logins/s/core")
+
+    @staticmethod
+    def run(encoded, threads, seconds):
+        counts = [0] * threads
+        deadline = time.perf_counter() + seconds
+
+        def login(index):
+            while time.perf_counter() < deadline:
+                check_password('correct horse battery staple', encoded)
+                counts[index] += 1
+
+        workers = [threading.Thread(target=login, args=(index,)) for index in range(threads)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        return sum(counts)
+
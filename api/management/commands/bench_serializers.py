@@ -0,0 +1,74 @@
+import time
+from datetime import timedelta
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from rest_framework.renderers import JSONRenderer
+from api.engine import Position, cell_coordinates
+from api.fast_serializers import serialize_games
+from api.models import CustomUser, Game, Move
+from api.renderers import FastJSONRenderer
+from api.serializers import GameSerializer
+
+
+class Command(BaseCommand):
+    help = ("Compare GameSerializer + JSONRenderer with serialize_games + FastJSONRenderer on a synthetic game "
+            "list, checking that both produce identical bytes. Test data is rolled back afterwards.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--games', type=int, default=200)
+        parser.add_argument('--moves', type=int, default=30, help="Moves per game.")
+        parser.add_argument('--repeat', type=int, default=5)
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            games = self.create_games(options['games'], options['moves'])
+            slow, slow_time = self.measure(
+                lambda: JSONRenderer().render({"games": GameSerializer(games, many=True).data}), options['repeat']
+            )
+            fast, fast_time = self.measure(
+                lambda: FastJSONRenderer().render({"games": serialize_games(games)}), options['repeat']
+            )
+            transaction.set_rollback(True)
+
+        if slow != fast:
+            raise CommandError("Fast path output differs from GameSerializer output.")
+        self.stdout.write(
+            f"{options['games']} games x {options['moves']} moves, {len(fast)} bytes (identical): "
+            f"GameSerializer {slow_time * 1000:.1f}ms, fast path {fast_time * 1000:.1f}ms, "
+            f"speedup {slow_time / fast_time:.1f}x"
+        )
+
+    @staticmethod
+    def measure(render, repeat):
+        best = None
+        for _ in range(repeat):
+            start = time.perf_counter()
+            output = render()
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        return output, best
+
+    @staticmethod
+    def create_games(count, moves_per_game):
+        player = CustomUser.objects.create_user('bench-serializer-player', 'bench-player@example.com')
+        opponents = CustomUser.objects.bulk_create([
+            CustomUser(username=f"bench-serializer-{index}", email=f"bench-serializer-{index}@example.com")
+            for index in range(count)
+        ])
+        games = Game.objects.bulk_create([
+            Game(player1=player, player2=opponent, time_limit=timedelta(days=1 + index % 3))
+            for index, opponent in enumerate(opponents)
+        ])
+
+        position, moves = Position(), []
+        while len(moves) < moves_per_game and not position.is_over:
+            cell = next(cell for cell in position.legal_moves() if not position.wins_at(cell, position.to_move))
+            position.play(cell)
+            moves.append(cell_coordinates(cell))
+        Move.objects.bulk_create([
+            Move(game_ref=game, player=player if index % 2 == 0 else game.player2, row=row, column=column,
+                 move_order=index + 1)
+            for game in games
+            for index, (row, column) in enumerate(moves)
+        ])
+        return Game.objects.filter(player1=player).order_by('-updated_at', 'id')
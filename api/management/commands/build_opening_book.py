@@ -0,0 +1,30 @@
+import os
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from api.opening_book import build_opening_book
+
+
+class Command(BaseCommand):
+    help = "Evaluate every position up to --max-ply and write the opening book used by the computer opponent."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--max-ply', type=int, default=3)
+        # Deeper than the on-request search (COMPUTER_MAX_DEPTH), which is what makes the book worth having.
+        parser.add_argument('--depth', type=int, default=6)
+        parser.add_argument('--processes', type=int, default=os.cpu_count() or 1)
+        parser.add_argument('--output', default=str(settings.OPENING_BOOK_PATH))
+
+    def handle(self, *args, **options):
+        if options['depth'] <= settings.COMPUTER_MAX_DEPTH:
+            self.stderr.write(self.style.WARNING(
+                f"--depth {options['depth']} is no deeper than COMPUTER_MAX_DEPTH ({settings.COMPUTER_MAX_DEPTH}); "
+                f"the book will not play better than the live search."
+            ))
+
+        def progress(done, total):
+            if done % 1000 == 0 or done == total:
+                self.stdout.write(f"Evaluated {done}/{total} positions")
+
+        count = build_opening_book(options['output'], options['max_ply'], options['depth'], progress=progress,
+                                   processes=options['processes'])
+        self.stdout.write(self.style.SUCCESS(f"Wrote {count} positions to {options['output']}"))
@@ -0,0 +1,113 @@
+import time
+from array import array
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import F
+from api.events import run_consumers_on_commit
+from api.models import CustomUser, Game, GameEvent, UserStats
+from api.services import GameService, K_FACTOR
+
+
+class Command(BaseCommand):
+    help = ("Recompute every online_rating by replaying Elo over the history of completed games, "
+            "e.g. after changing the K-factor or correcting past results.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--k-factor', type=float, default=K_FACTOR)
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--dry-run', action='store_true', help="Report the rating changes without writing them.")
+        parser.add_argument('--show', type=int, default=20, help="Number of largest changes to list.")
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        k_factor = options['k_factor']
+        initial_rating = CustomUser._meta.get_field('online_rating').default
+        started = time.perf_counter()
+
+        # Dense per-user state: slot i of `ratings` and `peaks` belongs to user_ids[i].
+        user_ids, usernames, old_ratings = [], [], array('q')
+        for user_id, username, online_rating in (
+            CustomUser.objects.order_by('id').values_list('id', 'username', 'online_rating').iterator(chunk_size=batch_size)
+        ):
+            user_ids.append(user_id)
+            usernames.append(username)
+            old_ratings.append(online_rating)
+        slots = {user_id: slot for slot, user_id in enumerate(user_ids)}
+        names = dict(zip(user_ids, usernames))
+        ratings = array('q', [initial_rating]) * len(user_ids)
+        peaks = array('q', ratings)
+
+        # The rating gains depend only on the rating difference, which repeats heavily across games.
+        # Each entry holds exactly the terms GameService.elo_ratings adds for a win, so results match it.
+        deltas = {}
+        replayed = skipped = 0
+        games = (
+            Game.objects.filter(is_complete=True)
+            .order_by('completed_at', 'id')
+            .values_list('player1_id', 'player2_id', 'winner')
+        )
+        for player1_id, player2_id, winner in games.iterator(chunk_size=batch_size):
+            side = GameService.winner_side(winner, names.get(player1_id), names.get(player2_id))
+            if side is None or player1_id not in slots or player2_id not in slots:
+                skipped += 1
+                continue
+            if side == 1:
+                winner_slot, loser_slot = slots[player1_id], slots[player2_id]
+            else:
+                winner_slot, loser_slot = slots[player2_id], slots[player1_id]
+
+            winner_rating, loser_rating = ratings[winner_slot], ratings[loser_slot]
+            difference = loser_rating - winner_rating
+            delta = deltas.get(difference)
+            if delta is None:
+                expected_loser = 1 - 1 / (1 + 10 ** (difference / 400))
+                delta = deltas[difference] = (k_factor * expected_loser, k_factor * -expected_loser)
+            winner_rating = max(round(winner_rating + delta[0]), 0)
+            loser_rating = max(round(loser_rating + delta[1]), 0)
+            ratings[winner_slot], ratings[loser_slot] = winner_rating, loser_rating
+            if winner_rating > peaks[winner_slot]:
+                peaks[winner_slot] = winner_rating
+            replayed += 1
+        elapsed = time.perf_counter() - started
+
+        changed = [slot for slot in range(len(user_ids)) if ratings[slot] != old_ratings[slot]]
+        self.stdout.write(
+            f"Replayed {replayed} games in {elapsed:.2f}s with K={k_factor:g} "
+            f"({skipped} skipped: unrecognised winner or deleted player); "
+            f"{len(changed)} of {len(user_ids)} ratings change."
+        )
+        for slot in sorted(changed, key=lambda slot: -abs(ratings[slot] - old_ratings[slot]))[:options['show']]:
+            change = ratings[slot] - old_ratings[slot]
+            self.stdout.write(f"  {usernames[slot]}: {old_ratings[slot]} -> {ratings[slot]} ({change:+d})")
+        if options['dry_run']:
+            return
+
+        with transaction.atomic():
+            for start in range(0, len(changed), batch_size):
+                chunk = changed[start:start + batch_size]
+                CustomUser.objects.bulk_update(
+                    [CustomUser(id=user_ids[slot], online_rating=ratings[slot]) for slot in chunk], ['online_rating']
+                )
+                GameEvent.objects.bulk_create([
+                    GameEvent(
+                        kind=GameEvent.RATING_CHANGED,
+                        user_id=user_ids[slot],
+                        payload={'old_rating': old_ratings[slot], 'new_rating': ratings[slot], 'recomputed': True},
+                    )
+                    for slot in chunk
+                ])
+            # bulk_create skips the post_save signal that normally schedules this.
+            run_consumers_on_commit(GameEvent.RATING_CHANGED)
+
+            stats = []
+            for row in UserStats.objects.only('user_id', 'rating_peak').iterator(chunk_size=batch_size):
+                peak = peaks[slots[row.user_id]] if row.user_id in slots else row.rating_peak
+                if peak != row.rating_peak:
+                    row.rating_peak = peak
+                    stats.append(row)
+            UserStats.objects.bulk_update(stats, ['rating_peak'], batch_size=batch_size)
+            # Nearly every game list shows a changed rating, so invalidate all of them in one statement
+            # rather than resolving each changed user's opponents.
+            CustomUser.objects.update(data_version=F('data_version') + 1)
+
+        self.stdout.write(self.style.SUCCESS(f"Updated {len(changed)} ratings."))
@@ -0,0 +1,30 @@
+import time
+from django.core.management.base import BaseCommand
+from api.events import CONSUMERS
+
+
+class Command(BaseCommand):
+    help = "Apply pending GameEvents to the read models, once or continuously."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--consumer', action='append', choices=sorted(CONSUMERS),
+                            help="Consumer to run; may be repeated. Defaults to every consumer.")
+        parser.add_argument('--reset', action='store_true', help="Clear the read models and replay the whole log.")
+        parser.add_argument('--loop', action='store_true', help="Keep polling for new events.")
+        parser.add_argument('--interval', type=float, default=1.0)
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        consumers = [CONSUMERS[name]() for name in options['consumer'] or sorted(CONSUMERS)]
+        if options['reset']:
+            for consumer in consumers:
+                consumer.reset()
+
+        while True:
+            for consumer in consumers:
+                applied = consumer.run(batch_size=options['batch_size'])
+                if applied:
+                    self.stdout.write(f"{consumer.name}: applied {applied} events")
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
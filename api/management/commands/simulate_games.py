@@ -0,0 +1,61 @@
+import os
+import time
+from multiprocessing import Pool
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from api.simulation import DRAW, MAGIC, make_policy, simulate_chunk
+
+
+class Command(BaseCommand):
+    help = ("Play self-play games across a process pool, stream them to a compact results file and report "
+            "first-player win rate and average game length.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--games', type=int, default=10000)
+        parser.add_argument('--first', default='greedy', help="Policy for the first player: random, greedy or search:<depth>.")
+        parser.add_argument('--second', default='greedy', help="Policy for the second player.")
+        parser.add_argument('--processes', type=int, default=os.cpu_count() or 1)
+        parser.add_argument('--chunk-size', type=int, default=1000, help="Games per worker task.")
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--output', default='simulation.bin')
+        parser.add_argument('--use-opening-book', action='store_true',
+                            help="Let search policies answer early positions from OPENING_BOOK_PATH.")
+
+    def handle(self, *args, **options):
+        for option in ('games', 'processes', 'chunk_size'):
+            if options[option] < 1:
+                raise CommandError(f"--{option.replace('_', '-')} must be at least 1.")
+        for spec in (options['first'], options['second']):
+            try:
+                make_policy(spec, None)
+            except ValueError as e:
+                raise CommandError(e)
+        book_path = str(settings.OPENING_BOOK_PATH) if options['use_opening_book'] else None
+
+        games, chunk_size = options['games'], options['chunk_size']
+        tasks = [
+            (options['first'], options['second'], options['seed'] * 1000003 + index, min(chunk_size, games - start),
+             book_path)
+            for index, start in enumerate(range(0, games, chunk_size))
+        ]
+
+        outcomes = [0, 0, 0]
+        plies = 0
+        started = time.perf_counter()
+        with open(options['output'], 'wb') as output, Pool(options['processes']) as pool:
+            output.write(MAGIC)
+            for records, chunk_outcomes, chunk_plies in pool.imap_unordered(simulate_chunk, tasks):
+                output.write(records)
+                outcomes = [total + count for total, count in zip(outcomes, chunk_outcomes)]
+                plies += chunk_plies
+        elapsed = time.perf_counter() - started
+
+        self.stdout.write(
+            f"{games} games ({options['first']} vs {options['second']}) in {elapsed:.1f}s "
+            f"on {options['processes']} processes ({games / elapsed:.0f} games/s)\n"
+            f"first player wins:  {outcomes[0] / games:.2%}\n"
+            f"second player wins: {outcomes[1] / games:.2%}\n"
+            f"draws:              {outcomes[DRAW] / games:.2%}\n"
+            f"average length:     {plies / games:.1f} moves\n"
+            f"results written to {options['output']}"
+        )
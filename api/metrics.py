@@ -0,0 +1,126 @@
+import bisect
+import threading
+
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500)
+RESPONSE_SIZE_BUCKETS = (100, 1000, 10000, 100000, 1000000, 10000000)
+
+
+class Histogram:
+    def __init__(self, name, documentation, buckets):
+        self.name = name
+        self.documentation = documentation
+        self.buckets = tuple(buckets)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, label_values, value):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [[0] * (len(self.buckets) + 1), 0, 0]
+            series[0][index] += 1
+            series[1] += 1
+            series[2] += value
+
+    def collect(self, label_names):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            snapshot = [(labels, list(series[0]), series[1], series[2]) for labels, series in self._series.items()]
+        for label_values, counts, total, value_sum in sorted(snapshot):
+            labels = _format_labels(label_names, label_values)
+            cumulative = 0
+            for bound, count in zip(self.buckets, counts):
+                cumulative += count
+                lines.append(f'{self.name}_bucket{{{labels},le="{bound}"}} {cumulative}')
+            lines.append(f'{self.name}_bucket{{{labels},le="+Inf"}} {total}')
+            lines.append(f"{self.name}_sum{{{labels}}} {value_sum}")
+            lines.append(f"{self.name}_count{{{labels}}} {total}")
+        return lines
+
+
+class Counter:
+    def __init__(self, name, documentation):
+        self.name = name
+        self.documentation = documentation
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def inc(self, label_values, amount=1):
+        with self._lock:
+            self._series[label_values] = self._series.get(label_values, 0) + amount
+
+    def collect(self, label_names):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            snapshot = sorted(self._series.items())
+        for label_values, value in snapshot:
+            lines.append(f"{self.name}{{{_format_labels(label_names, label_values)}}} {value}")
+        return lines
+
+
+class MetricsRegistry:
+    """
+    Process-local request metrics, rendered in the Prometheus text exposition format.
+    Each worker process keeps its own registry, so scrape every worker (or aggregate by instance).
+    """
+    REQUEST_LABELS = ('view', 'method', 'status')
+    VIEW_LABELS = ('view', 'method')
+
+    def __init__(self):
+        self.request_latency = Histogram(
+            'diagonalduel_request_latency_seconds', 'Request latency by view.', LATENCY_BUCKETS
+        )
+        self.response_size = Histogram(
+            'diagonalduel_response_size_bytes', 'Response body size by view.', RESPONSE_SIZE_BUCKETS
+        )
+        self.db_queries = Histogram(
+            'diagonalduel_db_queries_per_request', 'Database queries issued per instrumented request.',
+            QUERY_COUNT_BUCKETS
+        )
+        self.db_time = Histogram(
+            'diagonalduel_db_time_seconds', 'Database time spent per instrumented request.', LATENCY_BUCKETS
+        )
+        self.instrumented_requests = Counter(
+            'diagonalduel_db_instrumented_requests_total', 'Requests sampled for database instrumentation.'
+        )
+        self._collectors = []
+
+    def register_collector(self, collector):
+        """
+        Register a callable returning extra exposition lines, evaluated at scrape time.
+        """
+        self._collectors.append(collector)
+
+    def observe_request(self, view, method, status, duration, size):
+        self.request_latency.observe((view, method, str(status)), duration)
+        self.response_size.observe((view, method, str(status)), size)
+
+    def observe_queries(self, view, method, count, duration):
+        self.instrumented_requests.inc((view, method))
+        self.db_queries.observe((view, method), count)
+        self.db_time.observe((view, method), duration)
+
+    def render(self):
+        lines = []
+        lines += self.request_latency.collect(self.REQUEST_LABELS)
+        lines += self.response_size.collect(self.REQUEST_LABELS)
+        lines += self.instrumented_requests.collect(self.VIEW_LABELS)
+        lines += self.db_queries.collect(self.VIEW_LABELS)
+        lines += self.db_time.collect(self.VIEW_LABELS)
+        for collector in self._collectors:
+            lines += collector()
+        return "\n".join(lines) + "\n"
+
+
+def _format_labels(names, values):
+    return ",".join(f'{name}="{_escape(value)}"' for name, value in zip(names, values))
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+registry = MetricsRegistry()
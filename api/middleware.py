@@ -0,0 +1,60 @@
+import random
+import time
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connection
+from .metrics import registry
+
+
+class QueryRecorder:
+    """
+    `connection.execute_wrapper` hook counting queries and the time spent in them.
+    """
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - start
+            self.count += 1
+
+
+class MetricsMiddleware:
+    """
+    Records per-view latency and response size for every request, plus DB query count and DB time
+    for a configurable fraction of requests (METRICS['QUERY_SAMPLE_RATE']). Lowering the sample rate
+    is the low-overhead production mode: unsampled requests never touch the DB cursor path.
+    """
+    def __init__(self, get_response):
+        config = getattr(settings, 'METRICS', {})
+        if not config.get('ENABLED', True):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.query_sample_rate = config.get('QUERY_SAMPLE_RATE', 1.0)
+
+    def __call__(self, request):
+        start = time.perf_counter()
+        recorder = None
+        if self.query_sample_rate >= 1.0 or random.random() < self.query_sample_rate:
+            recorder = QueryRecorder()
+            with connection.execute_wrapper(recorder):
+                response = self.get_response(request)
+        else:
+            response = self.get_response(request)
+        duration = time.perf_counter() - start
+
+        view = request.resolver_match.view_name if request.resolver_match else 'unmatched'
+        registry.observe_request(view, request.method, response.status_code, duration, self._response_size(response))
+        if recorder is not None:
+            registry.observe_queries(view, request.method, recorder.count, recorder.duration)
+        return response
+
+    @staticmethod
+    def _response_size(response):
+        if response.streaming:
+            return int(response.get('Content-Length', 0))
+        return len(response.content)
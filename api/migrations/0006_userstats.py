@@ -0,0 +1,28 @@
+# Generated by Django 5.1.3 on 2026-10-19 16:58
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0005_rename_points_customuser_computer_points_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserStats',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stats', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('games_played', models.PositiveIntegerField(default=0)),
+                ('wins', models.PositiveIntegerField(default=0)),
+                ('losses', models.PositiveIntegerField(default=0)),
+                ('timeouts', models.PositiveIntegerField(default=0, help_text='Games lost on time.')),
+                ('current_streak', models.IntegerField(default=0, help_text='Positive for a win streak, negative for a losing streak.')),
+                ('rating_peak', models.PositiveIntegerField(default=1000)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.1.3 on 2026-10-19 17:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0006_userstats'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='game',
+            name='packed_moves',
+            field=models.BinaryField(blank=True, null=True),
+        ),
+    ]
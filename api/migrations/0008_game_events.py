@@ -0,0 +1,50 @@
+# Generated by Django 5.1.3 on 2026-10-19 17:04
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0007_game_packed_moves'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EventConsumerCheckpoint',
+            fields=[
+                ('name', models.CharField(max_length=100, primary_key=True, serialize=False)),
+                ('last_sequence', models.BigIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='LeaderboardEntry',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='leaderboard_entry', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('username', models.CharField(max_length=150)),
+                ('online_rating', models.PositiveIntegerField(default=1000)),
+                ('games_played', models.PositiveIntegerField(default=0)),
+                ('wins', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'ordering': ['-online_rating'],
+            },
+        ),
+        migrations.CreateModel(
+            name='GameEvent',
+            fields=[
+                ('sequence', models.BigAutoField(primary_key=True, serialize=False)),
+                ('kind', models.CharField(choices=[('match_created', 'Match created'), ('move_played', 'Move played'), ('game_won', 'Game won'), ('game_timed_out', 'Game timed out'), ('rating_changed', 'Rating changed')], max_length=32)),
+                ('payload', models.JSONField(default=dict)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('game', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='events', to='api.game')),
+                ('user', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='game_events', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['sequence'],
+            },
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.1.3 on 2026-10-19 17:05
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0008_game_events'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ComputerGame',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('client_id', models.UUIDField(help_text='Client-generated id that makes resubmission idempotent.')),
+                ('packed_moves', models.BinaryField()),
+                ('human_first', models.BooleanField(default=True)),
+                ('difficulty', models.CharField(max_length=20)),
+                ('human_won', models.BooleanField(default=False)),
+                ('points', models.PositiveIntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='computer_games', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('user', 'client_id'), name='unique_user_computer_game')],
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.1.3 on 2026-10-19 17:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0011_game_version'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='eventconsumercheckpoint',
+            name='gap_detected_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
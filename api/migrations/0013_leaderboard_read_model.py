@@ -0,0 +1,43 @@
+# Generated by Django 5.1.3 on 2026-10-19 17:46
+
+from django.db import migrations, models
+
+
+def record_existing_users(apps, schema_editor):
+    """
+    Users created before USER_REGISTERED existed get one snapshot event each, so the leaderboard read
+    model lists them (including those who never played) once the consumer runs.
+    """
+    CustomUser = apps.get_model('api', 'CustomUser')
+    GameEvent = apps.get_model('api', 'GameEvent')
+    users = CustomUser.objects.order_by('id').values_list('id', 'username', 'computer_points', 'online_rating')
+    events = [
+        GameEvent(
+            kind='user_registered',
+            user_id=user_id,
+            payload={'username': username, 'computer_points': computer_points, 'online_rating': online_rating},
+        )
+        for user_id, username, computer_points, online_rating in users.iterator(chunk_size=1000)
+    ]
+    GameEvent.objects.bulk_create(events, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0012_eventconsumercheckpoint_gap_detected_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='leaderboardentry',
+            name='computer_points',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AlterField(
+            model_name='gameevent',
+            name='kind',
+            field=models.CharField(choices=[('match_created', 'Match created'), ('move_played', 'Move played'), ('game_won', 'Game won'), ('game_timed_out', 'Game timed out'), ('rating_changed', 'Rating changed'), ('user_registered', 'User registered'), ('computer_points_changed', 'Computer points changed')], max_length=32),
+        ),
+        migrations.RunPython(record_existing_users, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 5.1.3 on 2026-10-19 18:03
+
+from django.db import migrations, models
+from django.db.models import F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def stamp_completed_games(apps, schema_editor):
+    """
+    Use the time the game's result event was written, falling back to updated_at for games completed
+    before the event log existed.
+    """
+    Game = apps.get_model('api', 'Game')
+    GameEvent = apps.get_model('api', 'GameEvent')
+    result_events = GameEvent.objects.filter(
+        game=OuterRef('pk'), kind__in=['game_won', 'game_timed_out']
+    ).order_by('sequence')
+    Game.objects.filter(is_complete=True).update(
+        completed_at=Coalesce(Subquery(result_events.values('created_at')[:1]), F('updated_at'))
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0013_leaderboard_read_model'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='game',
+            name='completed_at',
+            field=models.DateTimeField(blank=True, db_index=True, null=True),
+        ),
+        migrations.RunPython(stamp_completed_games, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.1.3 on 2026-10-19 18:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0014_game_completed_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='game',
+            name='packed_move_ids',
+            field=models.BinaryField(blank=True, null=True),
+        ),
+    ]
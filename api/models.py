@@ -3,6 +3,8 @@ from django.db import models, transaction
 from django.utils.translation import gettext_lazy as _
 from django.conf import settings
 from datetime import timedelta
+import struct
+from .engine import cell_index, cell_coordinates
 
 
 class CustomUserManager(BaseUserManager):
@@ -29,6 +31,8 @@ class CustomUser(AbstractBaseUser, PermissionsMixin):
     email = models.EmailField(unique=True)
     computer_points = models.PositiveIntegerField(default=0)
     online_rating = models.PositiveIntegerField(default=1000)
+    # Bumped whenever anything in this user's game list or matchmaking state changes; used for ETags.
+    data_version = models.PositiveBigIntegerField(default=0)
 
     is_active = models.BooleanField(default=True)
     is_staff = models.BooleanField(default=False)
@@ -66,6 +70,18 @@ class Game(models.Model):
     time_limit = models.DurationField(default=timedelta(days=1))
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now_add=True)
+    # When the result was applied to ratings and stats. Timeouts leave updated_at at the last move, so
+    # replays of the rating history order by this instead.
+    completed_at = models.DateTimeField(null=True, blank=True, db_index=True)
+    # Set once a completed game is archived: one byte (row * 8 + column) per move, in move order.
+    # Archived games have no Move rows.
+    packed_moves = models.BinaryField(null=True, blank=True, editable=False)
+    # The archived Move rows' ids as little-endian unsigned 64-bit integers, in move order, so archived
+    # moves are listed with the ids they had. Null for games archived before this was kept; their moves
+    # are listed with a null id.
+    packed_move_ids = models.BinaryField(null=True, blank=True, editable=False)
+    # Incremented by every move; lets cached game state be validated with the row alone.
+    version = models.PositiveIntegerField(default=0)
 
     def __str__(self):
         return f"Game between {self.player1.username if self.player1 else '[Deleted User]'} and {self.player2.username if self.player2 else '[Deleted User]'}"
@@ -79,11 +95,53 @@ class Game(models.Model):
             'player2': self.player2.username if self.player2 else '[Deleted User]',
         }
 
+    def move_list(self):
+        """
+        The game's moves in order, read from the Move table or, for archived games, rebuilt from
+        `packed_moves` and `packed_move_ids` as unsaved Move instances.
+        """
+        if self.packed_moves is None:
+            return self.moves.all()
+        move_ids = Game.unpack_move_ids(self.packed_move_ids)
+        return [
+            Move(
+                id=move_ids[index] if move_ids else None,
+                game_ref=self,
+                player=self.player1 if index % 2 == 0 else self.player2,
+                row=row,
+                column=column,
+                move_order=index + 1,
+            )
+            for index, (row, column) in enumerate(Game.unpack_moves(self.packed_moves))
+        ]
+
+    @staticmethod
+    def pack_moves(moves):
+        return bytes(cell_index(row, column) for row, column in moves)
+
+    @staticmethod
+    def unpack_moves(packed_moves):
+        return [cell_coordinates(cell) for cell in bytes(packed_moves)]
+
+    @staticmethod
+    def pack_move_ids(move_ids):
+        return struct.pack(f'<{len(move_ids)}Q', *move_ids)
+
+    @staticmethod
+    def unpack_move_ids(packed_move_ids):
+        """
+        :return: The ids, or None for games archived without them
+        """
+        if packed_move_ids is None:
+            return None
+        packed_move_ids = bytes(packed_move_ids)
+        return list(struct.unpack(f'<{len(packed_move_ids) // 8}Q', packed_move_ids))
+
     def get_turn(self):
         if self.winner:
             return None
         else:
-            all_moves = self.moves.all()
+            all_moves = self.move_list()
             if len(all_moves) % 2 == 0:
                 return self.player1
             else:
@@ -97,7 +155,9 @@ class Game(models.Model):
             return None
         player1, player2 = queue_entries[0].user, queue_entries[1].user
         game = Game.objects.create(player1=player1, player2=player2)
+        GameEvent.record_match_created(game)
         queue_entries.delete()
+        CustomUser.objects.filter(id__in=[player1.id, player2.id]).update(data_version=models.F('data_version') + 1)
         return game
 
 
@@ -115,6 +175,162 @@ class Move(models.Model):
         return f"Move {self.move_order} in Game {self.game.id} by {self.player.username} at ({self.row}, {self.column})"
 
 
+class UserStats(models.Model):
+    user = models.OneToOneField(
+        settings.AUTH_USER_MODEL, on_delete=models.CASCADE, primary_key=True, related_name="stats"
+    )
+    games_played = models.PositiveIntegerField(default=0)
+    wins = models.PositiveIntegerField(default=0)
+    losses = models.PositiveIntegerField(default=0)
+    timeouts = models.PositiveIntegerField(default=0, help_text=_("Games lost on time."))
+    current_streak = models.IntegerField(default=0, help_text=_("Positive for a win streak, negative for a losing streak."))
+    rating_peak = models.PositiveIntegerField(default=1000)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Stats for {self.user.username}"
+
+    def record(self, won, by_timeout=False):
+        self.games_played += 1
+        if won:
+            self.wins += 1
+            self.current_streak = self.current_streak + 1 if self.current_streak > 0 else 1
+        else:
+            self.losses += 1
+            self.current_streak = self.current_streak - 1 if self.current_streak < 0 else -1
+            if by_timeout:
+                self.timeouts += 1
+
+
+class ComputerGame(models.Model):
+    """
+    A game against the computer, verified by server-side replay before its points were credited.
+    """
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="computer_games")
+    client_id = models.UUIDField(help_text=_("Client-generated id that makes resubmission idempotent."))
+    # One byte (row * 8 + column) per move, as in Game.packed_moves.
+    packed_moves = models.BinaryField()
+    human_first = models.BooleanField(default=True)
+    difficulty = models.CharField(max_length=20)
+    human_won = models.BooleanField(default=False)
+    points = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'client_id'], name='unique_user_computer_game')
+        ]
+
+    def __str__(self):
+        return f"Computer game {self.client_id} by {self.user.username}"
+
+
+class GameEvent(models.Model):
+    """
+    Append-only log of game state changes, written in the same transaction as the change itself.
+    `sequence` gives a global order that read-model consumers resume from.
+    """
+    MATCH_CREATED = 'match_created'
+    MOVE_PLAYED = 'move_played'
+    GAME_WON = 'game_won'
+    GAME_TIMED_OUT = 'game_timed_out'
+    RATING_CHANGED = 'rating_changed'
+    USER_REGISTERED = 'user_registered'
+    COMPUTER_POINTS_CHANGED = 'computer_points_changed'
+    KIND_CHOICES = [
+        (MATCH_CREATED, _('Match created')),
+        (MOVE_PLAYED, _('Move played')),
+        (GAME_WON, _('Game won')),
+        (GAME_TIMED_OUT, _('Game timed out')),
+        (RATING_CHANGED, _('Rating changed')),
+        (USER_REGISTERED, _('User registered')),
+        (COMPUTER_POINTS_CHANGED, _('Computer points changed')),
+    ]
+
+    sequence = models.BigAutoField(primary_key=True)
+    kind = models.CharField(max_length=32, choices=KIND_CHOICES)
+    game = models.ForeignKey(Game, on_delete=models.SET_NULL, null=True, blank=True, related_name="events")
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True, related_name="game_events"
+    )
+    payload = models.JSONField(default=dict)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['sequence']
+
+    def __str__(self):
+        return f"#{self.sequence} {self.kind}"
+
+    @staticmethod
+    def record(kind, game=None, user=None, **payload):
+        return GameEvent.objects.create(kind=kind, game=game, user=user, payload=payload)
+
+    @staticmethod
+    def record_user_registered(user):
+        return GameEvent.record(
+            GameEvent.USER_REGISTERED,
+            user=user,
+            username=user.username,
+            computer_points=user.computer_points,
+            online_rating=user.online_rating,
+        )
+
+    @staticmethod
+    def record_match_created(game):
+        return GameEvent.record(
+            GameEvent.MATCH_CREATED,
+            game=game,
+            player1=game.player1_id,
+            player2=game.player2_id,
+            time_limit_days=game.time_limit.days,
+        )
+
+
+class EventConsumerCheckpoint(models.Model):
+    name = models.CharField(max_length=100, primary_key=True)
+    last_sequence = models.BigIntegerField(default=0)
+    # When the consumer first found sequence last_sequence + 1 missing while later events existed.
+    gap_detected_at = models.DateTimeField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.name} at #{self.last_sequence}"
+
+
+class LeaderboardEntry(models.Model):
+    """
+    Read model built from GameEvent by api.events.LeaderboardConsumer.
+    """
+    user = models.OneToOneField(
+        settings.AUTH_USER_MODEL, on_delete=models.CASCADE, primary_key=True, related_name="leaderboard_entry"
+    )
+    username = models.CharField(max_length=150)
+    computer_points = models.PositiveIntegerField(default=0)
+    online_rating = models.PositiveIntegerField(default=1000)
+    games_played = models.PositiveIntegerField(default=0)
+    wins = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        ordering = ['-online_rating']
+
+    def __str__(self):
+        return f"{self.username}: {self.online_rating}"
+
+
+class VersionCounter(models.Model):
+    """
+    Named global counters bumped whenever the data behind a shared endpoint changes; used for ETags.
+    """
+    LEADERBOARD = 'leaderboard'
+
+    name = models.CharField(max_length=50, primary_key=True)
+    value = models.PositiveBigIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.name}: {self.value}"
+
+
 class MatchmakingQueue(models.Model):
     user = models.ForeignKey(
         settings.AUTH_USER_MODEL,
@@ -0,0 +1,154 @@
+import mmap
+import os
+import struct
+from multiprocessing import Pool
+from django.conf import settings
+from .engine import Position, best_move, transpose, transpose_cell
+
+
+MAGIC = b'DDOB'
+VERSION = 1
+# magic, version, max ply, search depth, record count
+HEADER = struct.Struct('<4sHBBI')
+# side 0 bitboard, side 1 bitboard, best cell, score for the side to move
+RECORD = struct.Struct('<QQBb')
+KEY = struct.Struct('<QQ')
+
+
+def canonical_key(position):
+    """
+    A position and its transpose share one book entry; the smaller of the two keys is stored.
+    :return: (key, transposed) where transposed tells whether the stored move must be mirrored back
+    """
+    key = position.key()
+    mirrored = (transpose(key[0]), transpose(key[1]))
+    if mirrored < key:
+        return mirrored, True
+    return key, False
+
+
+def enumerate_positions(max_ply):
+    """
+    Every distinct non-terminal position reachable within `max_ply` plies, keyed canonically.
+    """
+    positions = {canonical_key(Position())[0]: Position()}
+    frontier = [Position()]
+    for _ in range(max_ply):
+        next_frontier = []
+        for position in frontier:
+            for cell in position.legal_moves():
+                child = position.copy()
+                if child.play(cell) or child.is_over:
+                    continue
+                key = canonical_key(child)[0]
+                if key not in positions:
+                    positions[key] = child
+                    next_frontier.append(child)
+        frontier = next_frontier
+    return positions
+
+
+def _evaluate(task):
+    position, depth = task
+    return best_move(position, depth)
+
+
+def build_opening_book(path, max_ply, depth, progress=None, processes=1):
+    """
+    Evaluate every position up to `max_ply` with a `depth` ply search and write the results as a
+    sorted file of fixed-size records.
+    :param processes: Worker processes to spread the searches over
+    :return: The number of records written
+    """
+    positions = sorted(enumerate_positions(max_ply).items())
+    tasks = [(position, depth) for _, position in positions]
+    records = []
+    with Pool(processes) as pool:
+        for index, (cell, score) in enumerate(pool.imap(_evaluate, tasks)):
+            key = positions[index][0]
+            records.append(RECORD.pack(key[0], key[1], cell, score))
+            if progress is not None:
+                progress(index + 1, len(positions))
+
+    # Processes serving lookups keep the old file mmapped, so never rewrite it in place: write a sibling
+    # and swap it in atomically. The old inode stays valid until their maps are closed.
+    temporary_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        with open(temporary_path, 'wb') as book_file:
+            book_file.write(HEADER.pack(MAGIC, VERSION, max_ply, depth, len(records)))
+            book_file.writelines(records)
+        os.replace(temporary_path, path)
+    finally:
+        if os.path.exists(temporary_path):
+            os.remove(temporary_path)
+    return len(records)
+
+
+class OpeningBook:
+    """
+    Read-only view of a book file. Records are looked up in place through `mmap` with a binary search,
+    so opening a book costs one header read regardless of its size.
+    """
+    def __init__(self, path):
+        with open(path, 'rb') as book_file:
+            self._mmap = mmap.mmap(book_file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, self.max_ply, self.depth, self.count = HEADER.unpack_from(self._mmap, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{path} is not a version {VERSION} opening book.")
+        if len(self._mmap) != HEADER.size + self.count * RECORD.size:
+            raise ValueError(f"{path} is truncated.")
+
+    def __len__(self):
+        return self.count
+
+    def lookup(self, position):
+        """
+        :return: (cell, score) for the side to move, or None if the position is not in the book
+        """
+        if position.ply > self.max_ply:
+            return None
+        key, transposed = canonical_key(position)
+        low, high = 0, self.count
+        while low < high:
+            middle = (low + high) // 2
+            offset = HEADER.size + middle * RECORD.size
+            record_key = KEY.unpack_from(self._mmap, offset)
+            if record_key < key:
+                low = middle + 1
+            elif record_key > key:
+                high = middle
+            else:
+                _, _, cell, score = RECORD.unpack_from(self._mmap, offset)
+                return (transpose_cell(cell) if transposed else cell), score
+        return None
+
+    def close(self):
+        self._mmap.close()
+
+
+_book = None
+_book_identity = None
+
+
+def get_opening_book():
+    """
+    The process-wide book at settings.OPENING_BOOK_PATH, or None if it has not been built. The file is
+    reopened whenever it is replaced (a new inode or modification time), so a book built or rebuilt
+    after startup is picked up without a restart.
+    """
+    global _book, _book_identity
+    path = getattr(settings, 'OPENING_BOOK_PATH', None)
+    try:
+        stat = os.stat(path) if path else None
+    except FileNotFoundError:
+        stat = None
+    identity = (str(path), stat.st_ino, stat.st_mtime_ns) if stat else None
+    if identity != _book_identity:
+        # The previous book is left for garbage collection rather than closed: another thread may be
+        # in the middle of a lookup on it.
+        try:
+            _book = OpeningBook(path) if identity else None
+        except FileNotFoundError:
+            _book, identity = None, None
+        _book_identity = identity
+    return _book
@@ -0,0 +1,202 @@
+import cProfile
+import json
+import os
+import random
+import sys
+import threading
+import time
+from collections import Counter
+from pathlib import Path
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connection
+
+
+_profiler_lock = threading.Lock()
+
+
+class SqlRecorder:
+    """
+    `connection.execute_wrapper` hook keeping the first `limit` statements of a request. Parameters
+    carry password hashes, emails and tokens, so they are only kept when `record_params` is set.
+    """
+    def __init__(self, limit, record_params=False):
+        self.limit = limit
+        self.record_params = record_params
+        self.statements = []
+        self.dropped = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            if len(self.statements) < self.limit:
+                statement = {'sql': sql, 'many': many, 'duration': time.perf_counter() - start}
+                if self.record_params:
+                    statement['params'] = repr(params)[:500]
+                self.statements.append(statement)
+            else:
+                self.dropped += 1
+
+
+class StackSampler:
+    """
+    Background thread that periodically samples the Python stacks of registered request threads.
+    Stacks are stored in collapsed (flamegraph) form: "file:function;file:function" -> sample count.
+    """
+    def __init__(self, interval):
+        self.interval = interval
+        self._samples = {}
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def start(self, thread_id):
+        with self._lock:
+            self._samples[thread_id] = Counter()
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='request-stack-sampler', daemon=True)
+                self._thread.start()
+
+    def stop(self, thread_id):
+        with self._lock:
+            return self._samples.pop(thread_id, Counter())
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            with self._lock:
+                if not self._samples:
+                    continue
+                frames = sys._current_frames()
+                for thread_id, counter in self._samples.items():
+                    frame = frames.get(thread_id)
+                    if frame is not None:
+                        counter[self._collapse(frame)] += 1
+
+    @staticmethod
+    def _collapse(frame):
+        stack = []
+        while frame is not None:
+            code = frame.f_code
+            stack.append(f"{os.path.basename(code.co_filename)}:{code.co_name}:{frame.f_lineno}")
+            frame = frame.f_back
+        return ";".join(reversed(stack))
+
+
+class ProfileStore:
+    """
+    Bounded on-disk ring buffer of request profiles. Each capture is a `<stem>.json` report, plus a
+    `<stem>.prof` cProfile dump (readable with pstats or snakeviz) for sampled requests. Once more than
+    `max_profiles` reports exist, the oldest ones are removed.
+    """
+    def __init__(self, directory, max_profiles):
+        self.directory = Path(directory)
+        self.max_profiles = max_profiles
+        self._lock = threading.Lock()
+
+    def save(self, report, profiler=None):
+        self.directory.mkdir(parents=True, exist_ok=True)
+        stem = f"{time.time_ns()}-{os.getpid()}-{threading.get_ident()}"
+        if profiler is not None:
+            profiler.dump_stats(self.directory / f"{stem}.prof")
+            report['profile'] = f"{stem}.prof"
+        with open(self.directory / f"{stem}.json", 'w') as report_file:
+            json.dump(report, report_file, indent=2, default=str)
+        self._prune()
+
+    def _prune(self):
+        with self._lock:
+            reports = sorted(self.directory.glob('*.json'))
+            for stale in reports[:max(len(reports) - self.max_profiles, 0)]:
+                stale.unlink(missing_ok=True)
+                stale.with_suffix('.prof').unlink(missing_ok=True)
+
+
+class ProfilingMiddleware:
+    """
+    Opt-in request profiling. A random PROFILING['SAMPLE_RATE'] fraction of requests runs under
+    cProfile; when PROFILING['SLOW_REQUEST_THRESHOLD'] is set, every other request is stack-sampled
+    and kept only if it took longer than the threshold. Captured requests also record their SQL.
+    When disabled the middleware removes itself from the stack.
+    """
+    def __init__(self, get_response):
+        config = getattr(settings, 'PROFILING', {})
+        if not config.get('ENABLED', False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.sample_rate = config.get('SAMPLE_RATE', 0.0)
+        self.slow_threshold = config.get('SLOW_REQUEST_THRESHOLD')
+        self.max_sql_statements = config.get('MAX_SQL_STATEMENTS', 500)
+        self.record_sql_params = config.get('RECORD_SQL_PARAMS', False)
+        self.store = ProfileStore(config.get('DIRECTORY', settings.BASE_DIR / 'profiles'),
+                                  config.get('MAX_PROFILES', 200))
+        self.sampler = StackSampler(config.get('SAMPLING_INTERVAL', 0.005))
+
+    def __call__(self, request):
+        if random.random() < self.sample_rate:
+            response = self._profile(request)
+            if response is not None:
+                return response
+
+        if self.slow_threshold is None:
+            return self.get_response(request)
+
+        thread_id = threading.get_ident()
+        recorder = SqlRecorder(self.max_sql_statements, self.record_sql_params)
+        start = time.perf_counter()
+        self.sampler.start(thread_id)
+        try:
+            with connection.execute_wrapper(recorder):
+                response = self.get_response(request)
+        finally:
+            stacks = self.sampler.stop(thread_id)
+        duration = time.perf_counter() - start
+        if duration >= self.slow_threshold:
+            self._save(request, response, 'slow', duration, recorder, stacks=stacks)
+        return response
+
+    def _profile(self, request):
+        """
+        Run the request under cProfile.
+        :return: The response, or None without calling the view if another request is already being profiled
+        """
+        # Python 3.12+ allows a single active profiler per process and it sees every thread, so profile
+        # one request at a time; concurrent sampled requests fall through to the slow-request path.
+        if not _profiler_lock.acquire(blocking=False):
+            return None
+        try:
+            profiler = cProfile.Profile()
+            try:
+                profiler.enable()
+            except ValueError:
+                # Another profiling tool (a debugger, coverage) owns the profiler hook.
+                return None
+            recorder = SqlRecorder(self.max_sql_statements, self.record_sql_params)
+            start = time.perf_counter()
+            try:
+                with connection.execute_wrapper(recorder):
+                    response = self.get_response(request)
+            finally:
+                profiler.disable()
+            self._save(request, response, 'sampled', time.perf_counter() - start, recorder, profiler=profiler)
+            return response
+        finally:
+            _profiler_lock.release()
+
+    def _save(self, request, response, trigger, duration, recorder, profiler=None, stacks=None):
+        report = {
+            'trigger': trigger,
+            'method': request.method,
+            'path': request.get_full_path(),
+            'view': request.resolver_match.view_name if request.resolver_match else None,
+            'status': response.status_code,
+            'duration': duration,
+            'captured_at': time.time(),
+            'sql': recorder.statements,
+            'sql_dropped': recorder.dropped,
+        }
+        if stacks is not None:
+            report['sampling_interval'] = self.sampler.interval
+            report['stacks'] = dict(stacks.most_common())
+        self.store.save(report, profiler=profiler)
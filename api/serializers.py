@@ -1,8 +1,11 @@
 from rest_framework import serializers
 from rest_framework.exceptions import AuthenticationFailed
 from rest_framework_simplejwt.tokens import RefreshToken
+from django.conf import settings
 from django.contrib.auth import authenticate
-from .models import CustomUser, Game, Move, MatchmakingQueue
+from .models import CustomUser, Game, Move, MatchmakingQueue, UserStats, GameEvent
+from .engine import Position, cell_index
+from .fast_serializers import serialize_games
 
 
 class UserRegistrationSerializer(serializers.ModelSerializer):
@@ -46,10 +49,7 @@ class LoginSerializer(serializers.Serializer):
         player2_games = Game.objects.filter(player2=user)
 
         user_games = player1_games | player2_games
-        sorted_games = sorted(user_games, key=lambda game: game.updated_at, reverse=True)
-
-        games_data = [GameSerializer(game).data for game in sorted_games]
-        return games_data
+        return serialize_games(user_games.order_by('-updated_at', 'id'))
 
 
 class CustomUserSerializer(serializers.ModelSerializer):
@@ -71,7 +71,7 @@ class MoveSerializer(serializers.ModelSerializer):
 class GameSerializer(serializers.ModelSerializer):
     player1 = serializers.StringRelatedField(read_only=True)
     player2 = serializers.StringRelatedField(read_only=True)
-    moves = MoveSerializer(many=True, read_only=True)
+    moves = MoveSerializer(source='move_list', many=True, read_only=True)
     player1_rating = serializers.SerializerMethodField()
     player2_rating = serializers.SerializerMethodField()
 
@@ -101,3 +101,45 @@ class LeaderboardSerializer(serializers.ModelSerializer):
     class Meta:
         model = CustomUser
         fields = ['username', 'computer_points', 'online_rating']
+
+
+class UserStatsSerializer(serializers.ModelSerializer):
+    username = serializers.CharField(source='user.username', read_only=True)
+
+    class Meta:
+        model = UserStats
+        fields = ['username', 'games_played', 'wins', 'losses', 'timeouts', 'current_streak', 'rating_peak']
+
+
+class GameEventSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = GameEvent
+        fields = ['sequence', 'kind', 'game', 'user', 'payload', 'created_at']
+
+
+class ComputerGameSubmissionSerializer(serializers.Serializer):
+    """
+    One completed game against the computer. `moves` is a compact string of row/column digit pairs,
+    e.g. "0001112233" for (0, 0), (0, 1), (1, 1), (2, 2), (3, 3).
+    """
+    id = serializers.UUIDField()
+    moves = serializers.RegexField(r'^([0-7][0-7])+$', max_length=128)
+    human_first = serializers.BooleanField(default=True)
+    difficulty = serializers.ChoiceField(choices=sorted(settings.COMPUTER_GAME_POINTS))
+
+    def validate(self, data):
+        moves = data['moves']
+        cells = [cell_index(int(moves[i]), int(moves[i + 1])) for i in range(0, len(moves), 2)]
+        position = Position()
+        try:
+            for cell in cells:
+                position.play_checked(cell)
+        except ValueError as e:
+            raise serializers.ValidationError({"moves": str(e)})
+        if not position.is_over:
+            raise serializers.ValidationError({"moves": "The game is not finished."})
+
+        data['packed_moves'] = bytes(cells)
+        data['human_won'] = position.winner == (0 if data['human_first'] else 1)
+        data['points'] = settings.COMPUTER_GAME_POINTS[data['difficulty']] if data['human_won'] else 0
+        return data
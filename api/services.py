@@ -1,40 +1,119 @@
 from datetime import datetime, timezone
 from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken
-from .models import Move
+from django.db import transaction
+from django.db.models import F, Q
+from .models import CustomUser, GameEvent, Move, UserStats, VersionCounter
+from .engine import Position, cell_index
+from .game_cache import GameState, game_state_cache
+
+
+K_FACTOR = 32
+TIMEOUT_SUFFIX = " wins by timeout"
 
 
 class GameService:
     @staticmethod
-    def make_move(game, player, row, column):
+    @transaction.atomic
+    def make_move(game, player, row, column, state=None):
+        """
+        :param state: The game's GameState from load_state, if the caller already has it
+        """
+        state = state or GameService.load_state(game)
         if game.is_complete:
             raise ValueError("Game is already complete.")
-        if not (player == game.get_turn()):
+        if not (player == GameService.turn_player(game, state)):
             raise ValueError("It's not your turn!")
 
-        move = Move.objects.create(game_ref=game, player=player, row=row, column=column, move_order=game.moves.count() + 1)
-        board = GameService.build_board(game)
-        if player == game.player1:
-            piece = 1
+        move = Move.objects.create(
+            game_ref=game, player=player, row=row, column=column, move_order=state.move_count + 1
+        )
+        GameEvent.record(
+            GameEvent.MOVE_PLAYED, game=game, user=player, row=row, column=column, move_order=move.move_order
+        )
+        if state.position.play(cell_index(row, column)):
+            # Only the player who just moved can have completed a line. The stored winner keeps
+            # check_winner's piece numbering, where build_board gives player1's stones the value 2.
+            winner = 2 if player == game.player1 else 1
+            loser_player = game.player2 if player == game.player1 else game.player1
+            GameService.complete_game(game, winner, player, loser_player)
         else:
-            piece = 2
-
-        board[row][column] = piece
-        winner = GameService.check_winner(game)
-        if winner:
-            game.winner = winner
-            game.is_complete = True
-
-            winner_player = game.player1 if winner == 1 else game.player2
-            loser_player = game.player2 if winner == 1 else game.player1
-            GameService.update_ratings(winner_player, loser_player, result=1)
+            VersionService.bump_users([game.player1_id, game.player2_id])
 
+        game.version += 1
         game.updated_at = datetime.now(timezone.utc)
         game.save()
+        state.version = game.version
+        transaction.on_commit(lambda: game_state_cache.put(game.id, state))
         return move
 
+    @staticmethod
+    def load_state(game):
+        """
+        The game's current GameState, from this process's cache when its version still matches the
+        Game row, otherwise rebuilt from the game's moves.
+        """
+        state = game_state_cache.get(game)
+        if state is None:
+            position = Position()
+            for move in game.move_list():
+                position.play(cell_index(move.row, move.column))
+            state = GameState(game.version, position)
+        return state
+
+    @staticmethod
+    def turn_player(game, state):
+        if game.winner:
+            return None
+        return game.player1 if state.position.to_move == 0 else game.player2
+
+    @staticmethod
+    def complete_game(game, winner_label, winner_player, loser_player, by_timeout=False):
+        """
+        Mark the game complete and apply its result to ratings and player stats.
+        Callers are expected to run this inside the transaction that saves the game.
+        """
+        game.winner = winner_label
+        game.is_complete = True
+        game.completed_at = datetime.now(timezone.utc)
+        GameEvent.record(
+            GameEvent.GAME_TIMED_OUT if by_timeout else GameEvent.GAME_WON,
+            game=game,
+            user=winner_player,
+            winner=winner_player.id if winner_player else None,
+            loser=loser_player.id if loser_player else None,
+            label=str(winner_label),
+        )
+        if winner_player and loser_player:
+            GameService.update_ratings(winner_player, loser_player, result=1, game=game)
+        StatsService.record_result(winner_player, loser_player, by_timeout=by_timeout)
+        VersionService.bump_users([game.player1_id, game.player2_id])
+
+    @staticmethod
+    def winner_side(winner, player1_name, player2_name):
+        """
+        Resolve a stored `Game.winner` value to the side that won.
+        :param winner: Either the piece number returned by check_winner or a "<username> wins by timeout" string
+        :return: 1 if player1 won, 2 if player2 won, None if unknown
+        """
+        if not winner:
+            return None
+        if winner.endswith(TIMEOUT_SUFFIX):
+            name = winner[:-len(TIMEOUT_SUFFIX)]
+            if name == player1_name:
+                return 1
+            if name == player2_name:
+                return 2
+            return None
+        # build_board marks the first mover's (player1's) stones as 2.
+        if winner == '2':
+            return 1
+        if winner == '1':
+            return 2
+        return None
+
     @staticmethod
     def build_board(game):
-        all_moves = game.moves.all()
+        all_moves = game.move_list()
         board = [[0] * 8 for _ in range(8)]
         for move in all_moves:
             player = 1
@@ -80,25 +159,79 @@ class GameService:
         return None
 
     @staticmethod
-    def update_ratings(winner, loser, result):
+    def update_ratings(winner, loser, result, game=None):
         """
         Update the Elo ratings for the winner and loser of a game.
         :param winner: Winner User instance
         :param loser: Loser User instance
         :param result: 1 if the winner won, 0 if the game was a draw
+        :param game: The Game the result comes from, recorded on the rating events
         """
-        K_FACTOR = 32
-        winner_rating = winner.rating
-        loser_rating = loser.rating
+        old_ratings = winner.online_rating, loser.online_rating
+        winner.online_rating, loser.online_rating = GameService.elo_ratings(
+            winner.online_rating, loser.online_rating, result
+        )
+        winner.save(update_fields=['online_rating'])
+        loser.save(update_fields=['online_rating'])
+        for user, old_rating in zip((winner, loser), old_ratings):
+            GameEvent.record(
+                GameEvent.RATING_CHANGED, game=game, user=user, old_rating=old_rating, new_rating=user.online_rating
+            )
+        VersionService.bump_users([winner.id, loser.id], include_opponents=True)
 
+    @staticmethod
+    def elo_ratings(winner_rating, loser_rating, result, k_factor=K_FACTOR):
+        """
+        :return: The (winner, loser) ratings after one game, rounded to whole points
+        """
         expected_winner = 1 / (1 + 10 ** ((loser_rating - winner_rating) / 400))
         expected_loser = 1 - expected_winner
 
-        winner.rating += K_FACTOR * (result - expected_winner)
-        loser.rating += K_FACTOR * ((1 - result) - expected_loser)
+        new_winner_rating = winner_rating + k_factor * (result - expected_winner)
+        new_loser_rating = loser_rating + k_factor * ((1 - result) - expected_loser)
+        return max(round(new_winner_rating), 0), max(round(new_loser_rating), 0)
+
+
+class StatsService:
+    @staticmethod
+    def record_result(winner, loser, by_timeout=False):
+        """
+        Incrementally apply one completed game to both players' UserStats rows.
+        Deleted players (None) are skipped.
+        """
+        for user, won in ((winner, True), (loser, False)):
+            if user is None:
+                continue
+            stats, _ = UserStats.objects.select_for_update().get_or_create(user=user)
+            stats.record(won, by_timeout=by_timeout and not won)
+            stats.rating_peak = max(stats.rating_peak, user.online_rating)
+            stats.save()
+
+class VersionService:
+    @staticmethod
+    def bump_users(user_ids, include_opponents=False):
+        """
+        Invalidate the ETags of the given users' game lists and matchmaking state.
+        :param include_opponents: Also bump everyone who has played these users, e.g. after a rating or
+            points change, since each game lists both players' details
+        """
+        user_ids = [user_id for user_id in user_ids if user_id is not None]
+        condition = Q(id__in=user_ids)
+        if include_opponents:
+            condition |= Q(games_as_player1__player2_id__in=user_ids) | Q(games_as_player2__player1_id__in=user_ids)
+        CustomUser.objects.filter(
+            id__in=CustomUser.objects.filter(condition).values('id')
+        ).update(data_version=F('data_version') + 1)
+
+    @staticmethod
+    def bump(name):
+        if not VersionCounter.objects.filter(name=name).update(value=F('value') + 1):
+            VersionCounter.objects.get_or_create(name=name, defaults={'value': 1})
+
+    @staticmethod
+    def get(name):
+        return VersionCounter.objects.filter(name=name).values_list('value', flat=True).first() or 0
 
-        winner.save()
-        loser.save()
 
 class CleanupService:
     def clean_expired_blacklisted_tokens(self):
@@ -0,0 +1,27 @@
+from django.db.models.signals import post_save, pre_delete
+from django.dispatch import receiver
+from .events import run_consumers_on_commit
+from .models import CustomUser, GameEvent, VersionCounter
+from .services import VersionService
+
+
+@receiver(post_save, sender=CustomUser)
+def record_user_registered(sender, instance, created, raw=False, **kwargs):
+    # Covers every way of creating a user (registration, createsuperuser, the admin), not just the API.
+    if created and not raw:
+        GameEvent.record_user_registered(instance)
+
+
+@receiver(post_save, sender=GameEvent)
+def apply_event(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        run_consumers_on_commit(instance.kind)
+
+
+@receiver(pre_delete, sender=CustomUser)
+def bump_opponent_versions(sender, instance, **kwargs):
+    # Deleting a user nulls their side of every game they played, which changes their opponents' game lists.
+    # Fires for queryset deletes too (e.g. the admin's bulk delete), unlike overriding delete().
+    VersionService.bump_users([instance.id], include_opponents=True)
+    # The user's LeaderboardEntry is removed by the cascade, without an event for the consumer to bump on.
+    VersionService.bump(VersionCounter.LEADERBOARD)
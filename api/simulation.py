@@ -0,0 +1,125 @@
+"""
+Self-play simulation on top of the database-free engine. Everything here is importable without Django
+so chunks can run in pool worker processes.
+
+Results are written as a stream of records: one byte with the number of moves, one byte with the
+outcome (0 first player won, 1 second player won, 2 draw) and one byte per move (row * 8 + column).
+"""
+import random
+import struct
+from .engine import Position, best_moves
+
+
+MAGIC = b'DDSG\x01'
+DRAW = 2
+RECORD_HEADER = struct.Struct('<BB')
+
+
+class RandomPolicy:
+    def __init__(self, rng):
+        self.rng = rng
+
+    def choose(self, position):
+        return self.rng.choice(position.legal_moves())
+
+
+class GreedyPolicy:
+    """
+    Wins immediately when possible, otherwise blocks the opponent's immediate win, otherwise plays randomly.
+    """
+    def __init__(self, rng):
+        self.rng = rng
+
+    def choose(self, position):
+        moves = position.legal_moves()
+        side = position.to_move
+        for target in (side, side ^ 1):
+            for cell in moves:
+                if position.wins_at(cell, target):
+                    return cell
+        return self.rng.choice(moves)
+
+
+class SearchPolicy:
+    """
+    Alpha-beta search to a fixed depth, answering from the opening book when one is given. Ties between
+    equally scored moves are broken with `rng`, so games between search policies differ by seed.
+    """
+    def __init__(self, rng, depth, book=None):
+        self.rng = rng
+        self.depth = depth
+        self.book = book
+
+    def choose(self, position):
+        if self.book is not None:
+            entry = self.book.lookup(position)
+            if entry is not None:
+                return entry[0]
+        return self.rng.choice(best_moves(position, self.depth)[0])
+
+
+def make_policy(spec, rng, book=None):
+    """
+    :param spec: "random", "greedy" or "search:<depth>"
+    """
+    name, _, argument = spec.partition(':')
+    if name == 'random':
+        return RandomPolicy(rng)
+    if name == 'greedy':
+        return GreedyPolicy(rng)
+    if name == 'search':
+        return SearchPolicy(rng, int(argument or 2), book=book)
+    raise ValueError(f"Unknown policy {spec!r}.")
+
+
+def play_game(first, second):
+    """
+    :return: (outcome, cells) where outcome is 0, 1 or DRAW
+    """
+    position = Position()
+    policies = (first, second)
+    cells = []
+    while not position.is_over:
+        cell = policies[position.to_move].choose(position)
+        position.play(cell)
+        cells.append(cell)
+    return (DRAW if position.winner is None else position.winner), cells
+
+
+def simulate_chunk(task):
+    """
+    Pool worker entry point.
+    :param task: (first policy spec, second policy spec, seed, number of games, opening book path or None)
+    :return: (encoded records, [first wins, second wins, draws], total plies)
+    """
+    first_spec, second_spec, seed, count, book_path = task
+    rng = random.Random(seed)
+    book = None
+    if book_path:
+        from .opening_book import OpeningBook
+        book = OpeningBook(book_path)
+    first = make_policy(first_spec, rng, book)
+    second = make_policy(second_spec, rng, book)
+
+    output = bytearray()
+    outcomes = [0, 0, 0]
+    plies = 0
+    for _ in range(count):
+        outcome, cells = play_game(first, second)
+        output += RECORD_HEADER.pack(len(cells), outcome)
+        output += bytes(cells)
+        outcomes[outcome] += 1
+        plies += len(cells)
+    return bytes(output), outcomes, plies
+
+
+def read_results(path):
+    """
+    Iterate (outcome, cells) over a results file.
+    """
+    with open(path, 'rb') as results:
+        if results.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"{path} is not a simulation results file.")
+        while header := results.read(RECORD_HEADER.size):
+            length, outcome = RECORD_HEADER.unpack(header)
+            yield outcome, list(results.read(length))
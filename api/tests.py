@@ -1 +1,509 @@
-from django.test import TestCase
+import json
+import os
+import tempfile
+import uuid
+from io import StringIO
+from datetime import timedelta
+from unittest import mock
+from django.core.management import CommandError, call_command
+from django.db.models import F
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from django.utils.timezone import now
+from rest_framework.test import APITestCase
+from api import opening_book, services
+from api.profiling import ProfileStore, ProfilingMiddleware
+from api.engine import Position
+from api.game_cache import GameStateCache
+from api.events import EventConsumer
+from api.models import (ComputerGame, CustomUser, EventConsumerCheckpoint, Game, GameEvent, LeaderboardEntry, Move,
+                        UserStats)
+from api.services import GameService, TIMEOUT_SUFFIX
+
+
+class GameTestCase(APITestCase):
+    def setUp(self):
+        # Test transactions roll back and reuse game ids, so give each test its own state cache.
+        self.cache = GameStateCache(16)
+        patcher = mock.patch.object(services, 'game_state_cache', self.cache)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.alice = CustomUser.objects.create_user(username='alice', email='alice@example.com', password='secret')
+        self.bob = CustomUser.objects.create_user(username='bob', email='bob@example.com', password='secret')
+        self.game = Game.objects.create(player1=self.alice, player2=self.bob)
+
+    def play(self, user, row, column):
+        self.client.force_authenticate(user)
+        return self.client.post(
+            reverse('move-create', args=[self.game.id]), {'row': row, 'column': column}, format='json'
+        )
+
+    def play_moves(self, moves):
+        """
+        Alternate moves starting with player1, asserting each one is accepted.
+        """
+        for index, (row, column) in enumerate(moves):
+            response = self.play(self.alice if index % 2 == 0 else self.bob, row, column)
+            self.assertEqual(response.status_code, 201, response.data)
+
+
+class GameResultTests(GameTestCase):
+    def test_player1_win_updates_winner_ratings_and_stats(self):
+        # alice (player1) completes row 0 while bob builds down column 0.
+        self.play_moves([(0, 0), (1, 0), (0, 1), (2, 0), (0, 2), (3, 0), (0, 3)])
+
+        self.game.refresh_from_db()
+        self.alice.refresh_from_db()
+        self.bob.refresh_from_db()
+        self.assertTrue(self.game.is_complete)
+        self.assertEqual(self.game.winner, '2')
+        self.assertEqual(GameService.winner_side(self.game.winner, 'alice', 'bob'), 1)
+        self.assertEqual((self.alice.online_rating, self.bob.online_rating), (1016, 984))
+
+        alice_stats, bob_stats = UserStats.objects.get(user=self.alice), UserStats.objects.get(user=self.bob)
+        self.assertEqual((alice_stats.games_played, alice_stats.wins, alice_stats.current_streak), (1, 1, 1))
+        self.assertEqual(alice_stats.rating_peak, 1016)
+        self.assertEqual((bob_stats.games_played, bob_stats.losses, bob_stats.timeouts), (1, 1, 0))
+
+    def test_player2_win_is_stored_as_piece_1(self):
+        self.play_moves([(0, 0), (1, 0), (0, 1), (2, 0), (1, 1), (3, 0), (2, 2), (4, 0)])
+
+        self.game.refresh_from_db()
+        self.assertEqual(self.game.winner, '1')
+        self.assertEqual(GameService.winner_side(self.game.winner, 'alice', 'bob'), 2)
+        self.assertEqual(CustomUser.objects.get(id=self.bob.id).online_rating, 1016)
+        self.assertEqual(UserStats.objects.get(user=self.bob).wins, 1)
+
+    def test_move_after_the_game_is_won_is_rejected(self):
+        self.play_moves([(0, 0), (1, 0), (0, 1), (2, 0), (0, 2), (3, 0), (0, 3)])
+
+        self.assertEqual(self.play(self.bob, 4, 0).status_code, 400)
+
+    def test_timed_out_game_is_won_by_the_waiting_player(self):
+        self.play_moves([(0, 0), (1, 0)])
+        Game.objects.filter(id=self.game.id).update(updated_at=now() - timedelta(days=2))
+
+        self.client.force_authenticate(self.bob)
+        response = self.client.get(reverse('user-games'))
+
+        self.assertEqual(response.status_code, 200)
+        self.game.refresh_from_db()
+        self.assertTrue(self.game.is_complete)
+        self.assertEqual(self.game.winner, f"bob{TIMEOUT_SUFFIX}")
+        self.assertEqual(response.json()['games'][0]['winner'], f"bob{TIMEOUT_SUFFIX}")
+        self.assertEqual(CustomUser.objects.get(id=self.bob.id).online_rating, 1016)
+        alice_stats = UserStats.objects.get(user=self.alice)
+        self.assertEqual((alice_stats.losses, alice_stats.timeouts), (1, 1))
+
+    def test_backfill_rebuilds_the_same_stats(self):
+        self.play_moves([(0, 0), (1, 0), (0, 1), (2, 0), (0, 2), (3, 0), (0, 3)])
+        expected = list(UserStats.objects.order_by('user_id').values('user_id', 'games_played', 'wins', 'losses'))
+        UserStats.objects.filter(user=self.alice).update(wins=5)
+
+        call_command('backfill_user_stats', stdout=mock.Mock())
+
+        self.assertEqual(
+            list(UserStats.objects.order_by('user_id').values('user_id', 'games_played', 'wins', 'losses')), expected
+        )
+
+    def test_winner_side_resolves_both_label_forms(self):
+        self.assertEqual(GameService.winner_side('2', 'alice', 'bob'), 1)
+        self.assertEqual(GameService.winner_side('1', 'alice', 'bob'), 2)
+        self.assertEqual(GameService.winner_side(f"alice{TIMEOUT_SUFFIX}", 'alice', 'bob'), 1)
+        self.assertEqual(GameService.winner_side(f"bob{TIMEOUT_SUFFIX}", 'alice', 'bob'), 2)
+        self.assertIsNone(GameService.winner_side(f"carol{TIMEOUT_SUFFIX}", 'alice', 'bob'))
+        self.assertIsNone(GameService.winner_side(None, 'alice', 'bob'))
+
+
+class RatingReplayTests(GameTestCase):
+    def play_history(self, stalled_moves=((0, 0), (1, 0))):
+        """
+        alice's game with bob stalls, bob then beats carol, and only afterwards does alice's game time
+        out, so the timed-out game's last move predates a result that was applied before it.
+        """
+        self.play_moves(stalled_moves)
+        Game.objects.filter(id=self.game.id).update(updated_at=now() - timedelta(days=2))
+
+        carol = CustomUser.objects.create_user(username='carol', email='carol@example.com', password='secret')
+        self.game = Game.objects.create(player1=self.bob, player2=carol)
+        for user, (row, column) in zip([self.bob, carol] * 4, [(0, 0), (1, 0), (0, 1), (2, 0), (0, 2), (3, 0), (0, 3)]):
+            self.assertEqual(self.play(user, row, column).status_code, 201)
+
+        self.client.force_authenticate(self.alice)
+        self.client.get(reverse('user-games'))
+
+    def ratings(self):
+        return dict(CustomUser.objects.values_list('username', 'online_rating'))
+
+    def test_replay_with_unchanged_k_factor_changes_nothing(self):
+        self.play_history()
+        before = self.ratings()
+        output = StringIO()
+
+        call_command('recompute_ratings', '--dry-run', stdout=output)
+        self.assertIn("0 of 3 ratings change", output.getvalue())
+        call_command('recompute_ratings', stdout=StringIO())
+
+        self.assertEqual(self.ratings(), before)
+
+    def test_backfill_keeps_streaks_in_completion_order(self):
+        # bob is left to move, so he beats carol and then loses on time: his streak ends at -1.
+        self.play_history(stalled_moves=[(0, 0)])
+        self.assertEqual(UserStats.objects.get(user=self.bob).current_streak, -1)
+        expected = list(UserStats.objects.order_by('user_id').values_list('user_id', 'current_streak', 'timeouts'))
+
+        call_command('backfill_user_stats', stdout=StringIO())
+
+        self.assertEqual(
+            list(UserStats.objects.order_by('user_id').values_list('user_id', 'current_streak', 'timeouts')), expected
+        )
+
+    def test_replay_with_a_new_k_factor_rewrites_ratings(self):
+        self.play_history()
+
+        call_command('recompute_ratings', '--k-factor', '16', stdout=StringIO())
+
+        self.assertEqual(self.ratings(), {'alice': 992, 'bob': 1016, 'carol': 992})
+
+
+class ComputerGamesTests(APITestCase):
+    # The human (first) completes row 0 while the computer builds down column 0.
+    HUMAN_WIN = "00100120023003"
+
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(username='alice', email='alice@example.com', password='secret')
+        self.client.force_authenticate(self.user)
+
+    def submit(self, data):
+        return self.client.post(reverse('computer-games'), data, format='json')
+
+    def test_verified_win_is_credited(self):
+        response = self.submit({'id': str(uuid.uuid4()), 'moves': self.HUMAN_WIN, 'difficulty': 'hard'})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((response.data['accepted'], response.data['points_awarded']), (1, 3))
+        self.assertEqual(CustomUser.objects.get(id=self.user.id).computer_points, 3)
+
+    def test_illegal_placement_and_unfinished_games_are_rejected(self):
+        response = self.submit({'games': [
+            {'id': str(uuid.uuid4()), 'moves': '0033', 'difficulty': 'easy'},
+            {'id': str(uuid.uuid4()), 'moves': '001001', 'difficulty': 'easy'},
+            {'id': str(uuid.uuid4()), 'moves': self.HUMAN_WIN, 'difficulty': 'easy'},
+        ]})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([rejected['index'] for rejected in response.data['rejected']], [0, 1])
+        self.assertEqual((response.data['accepted'], response.data['points_awarded']), (1, 1))
+        self.assertEqual(ComputerGame.objects.filter(user=self.user).count(), 1)
+
+    def test_resubmission_is_not_credited_twice(self):
+        game = {'id': str(uuid.uuid4()), 'moves': self.HUMAN_WIN, 'difficulty': 'medium'}
+        self.submit({'games': [game]})
+
+        response = self.submit([game, game])
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((response.data['accepted'], response.data['duplicates']), (0, 1))
+        self.assertEqual(CustomUser.objects.get(id=self.user.id).computer_points, 2)
+
+    def test_non_object_body_is_rejected(self):
+        self.assertEqual(self.submit("not a game").status_code, 400)
+
+
+class ComputerMoveTests(APITestCase):
+    def setUp(self):
+        user = CustomUser.objects.create_user(username='alice', email='alice@example.com', password='secret')
+        self.client.force_authenticate(user)
+
+    def test_suggests_a_legal_move(self):
+        response = self.client.post(reverse('computer-move'), {'moves': [[0, 0]], 'depth': 2}, format='json')
+
+        self.assertEqual(response.status_code, 200)
+        position = Position.from_moves([(0, 0)])
+        self.assertTrue(position.is_legal(response.data['row'] * 8 + response.data['column']))
+
+    def test_non_object_body_is_rejected(self):
+        self.assertEqual(self.client.post(reverse('computer-move'), [[0, 0]], format='json').status_code, 400)
+
+
+class GameListETagTests(GameTestCase):
+    def get_games(self, user, etag=None):
+        # Authenticate with a fresh row, as JWT authentication would, so data_version is current.
+        self.client.force_authenticate(CustomUser.objects.get(id=user.id))
+        headers = {'HTTP_IF_NONE_MATCH': etag} if etag else {}
+        return self.client.get(reverse('user-games'), **headers)
+
+    def test_unchanged_list_is_not_modified(self):
+        etag = self.get_games(self.alice)['ETag']
+
+        response = self.get_games(self.alice, etag)
+
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+
+    def test_opponent_move_changes_the_etag(self):
+        self.play_moves([(0, 0)])
+        etag = self.get_games(self.bob)['ETag']
+        self.assertEqual(self.get_games(self.bob, etag).status_code, 304)
+
+        self.assertEqual(self.play(self.bob, 1, 0).status_code, 201)
+        response = self.get_games(self.bob, etag)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(len(response.json()['games'][0]['moves']), 2)
+        self.assertEqual(self.get_games(self.bob, response['ETag']).status_code, 304)
+
+    def test_archiving_keeps_the_listing(self):
+        self.play_moves([(0, 0), (1, 0), (0, 1), (2, 0), (0, 2)])
+        Game.objects.filter(id=self.game.id).update(is_complete=True, updated_at=now() - timedelta(days=30))
+        live_moves = [
+            (move.id, move.player_id, move.row, move.column, move.move_order) for move in self.game.move_list()
+        ]
+        response = self.get_games(self.alice)
+
+        call_command('archive_games', stdout=mock.Mock())
+
+        game = Game.objects.get(id=self.game.id)
+        self.assertEqual(bytes(game.packed_moves), bytes([0, 8, 1, 16, 2]))
+        self.assertFalse(Move.objects.filter(game_ref=game).exists())
+        self.assertEqual(
+            [(move.id, move.player_id, move.row, move.column, move.move_order) for move in game.move_list()],
+            live_moves,
+        )
+        self.assertEqual(self.get_games(self.alice, response['ETag']).status_code, 304)
+        self.client.force_authenticate(CustomUser.objects.get(id=self.alice.id))
+        self.assertEqual(self.client.get(reverse('user-games')).json(), response.json())
+
+    def test_deleting_the_opponent_changes_the_etag(self):
+        etag = self.get_games(self.alice)['ETag']
+
+        self.bob.delete()
+
+        self.assertEqual(self.get_games(self.alice, etag).status_code, 200)
+
+
+class GameStateCacheTests(GameTestCase):
+    def play_committed(self, user, row, column):
+        # The cache is only filled once the move's transaction commits.
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.play(user, row, column)
+
+    def test_cached_state_is_reused(self):
+        self.play_committed(self.alice, 0, 0)
+
+        self.assertEqual(self.play_committed(self.bob, 1, 0).status_code, 201)
+        self.assertEqual((self.cache.hits, self.cache.stale), (1, 0))
+
+    def test_move_by_another_worker_rebuilds_the_state(self):
+        self.play_committed(self.alice, 0, 0)
+        # Another worker records bob's move without touching this process's cache.
+        Move.objects.create(game_ref=self.game, player=self.bob, row=1, column=0, move_order=2)
+        Game.objects.filter(id=self.game.id).update(version=F('version') + 1)
+
+        response = self.play_committed(self.alice, 0, 1)
+
+        self.assertEqual(response.status_code, 201, response.data)
+        self.assertEqual(response.data['row'], 0)
+        self.assertEqual(self.cache.stale, 1)
+        self.assertEqual(Move.objects.get(game_ref=self.game, row=0, column=1).move_order, 3)
+
+
+class LeaderboardTests(APITestCase):
+    def get_leaderboard(self, etag=None):
+        headers = {'HTTP_IF_NONE_MATCH': etag} if etag else {}
+        return self.client.get(reverse('leaderboard'), **headers)
+
+    def rating_usernames(self, response):
+        return [row['username'] for row in response.json()['online_rating_leaderboard']]
+
+    def test_lagging_read_model_falls_back_to_the_users_table(self):
+        # Test transactions never commit, so the consumer does not run and the entry is never written.
+        CustomUser.objects.create_user(username='dave', email='dave@example.com', password='secret')
+        etag = self.get_leaderboard()['ETag']
+        CustomUser.objects.create_user(username='erin', email='erin@example.com', password='secret', online_rating=1200)
+
+        response = self.get_leaderboard(etag)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(LeaderboardEntry.objects.exists())
+        self.assertEqual(self.rating_usernames(response), ['erin', 'dave'])
+
+    def test_committed_events_update_the_read_model(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            dave = CustomUser.objects.create_user(username='dave', email='dave@example.com', password='secret')
+        etag = self.get_leaderboard()['ETag']
+        self.assertEqual(self.get_leaderboard(etag).status_code, 304)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            CustomUser.objects.filter(id=dave.id).update(online_rating=1100)
+            GameEvent.record(GameEvent.RATING_CHANGED, user=dave, old_rating=1000, new_rating=1100)
+        response = self.get_leaderboard(etag)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['online_rating_leaderboard'], [{'username': 'dave', 'online_rating': 1100}])
+        self.assertEqual(LeaderboardEntry.objects.get(user=dave).online_rating, 1100)
+
+    def test_deleting_a_user_changes_the_etag(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            dave = CustomUser.objects.create_user(username='dave', email='dave@example.com', password='secret')
+        etag = self.get_leaderboard()['ETag']
+
+        dave.delete()
+        response = self.get_leaderboard(etag)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['online_rating_leaderboard'], [])
+
+
+class RecordingConsumer(EventConsumer):
+    name = 'recording'
+
+    def __init__(self):
+        self.applied = []
+
+    def handle(self, events):
+        self.applied.extend(event.sequence for event in events)
+
+    def clear(self):
+        self.applied = []
+
+
+class EventConsumerTests(TestCase):
+    def setUp(self):
+        events = [GameEvent.record(GameEvent.MATCH_CREATED) for _ in range(4)]
+        self.sequences = [event.sequence for event in events]
+        # A rolled-back or still uncommitted insert leaves a hole in the sequence.
+        events[2].delete()
+        self.consumer = RecordingConsumer()
+
+    def checkpoint(self):
+        return EventConsumerCheckpoint.objects.get(name=self.consumer.name)
+
+    def test_stops_at_a_gap(self):
+        self.assertEqual(self.consumer.run(), 2)
+
+        self.assertEqual(self.consumer.applied, self.sequences[:2])
+        self.assertEqual(self.checkpoint().last_sequence, self.sequences[1])
+        self.assertIsNotNone(self.checkpoint().gap_detected_at)
+        self.assertEqual(self.consumer.run(), 0)
+
+    def test_filled_gap_is_applied_in_order(self):
+        self.consumer.run()
+        # The uncommitted event becomes visible before the timeout.
+        GameEvent.objects.create(sequence=self.sequences[2], kind=GameEvent.MATCH_CREATED)
+
+        self.assertEqual(self.consumer.run(), 2)
+
+        self.assertEqual(self.consumer.applied, self.sequences)
+        self.assertIsNone(self.checkpoint().gap_detected_at)
+
+    def test_skips_a_gap_after_the_timeout(self):
+        self.consumer.run()
+        EventConsumerCheckpoint.objects.filter(name=self.consumer.name).update(
+            gap_detected_at=now() - timedelta(minutes=6)
+        )
+
+        with override_settings(EVENT_CONSUMER_GAP_TIMEOUT=timedelta(minutes=5)):
+            self.assertEqual(self.consumer.run(), 1)
+
+        self.assertEqual(self.consumer.applied, self.sequences[:2] + self.sequences[3:])
+        self.assertEqual(self.checkpoint().last_sequence, self.sequences[3])
+        self.assertIsNone(self.checkpoint().gap_detected_at)
+
+
+@override_settings(METRICS={'ENABLED': True, 'TOKEN': 'scrape-token', 'ALLOWED_IPS': ['10.0.0.5']})
+class MetricsAccessTests(APITestCase):
+    def test_anonymous_request_is_forbidden(self):
+        self.assertEqual(self.client.get(reverse('metrics')).status_code, 403)
+        self.assertEqual(
+            self.client.get(reverse('metrics'), HTTP_AUTHORIZATION='Bearer wrong').status_code, 403
+        )
+
+    def test_token_allowlisted_address_and_staff_are_allowed(self):
+        staff = CustomUser.objects.create_user(
+            username='ops', email='ops@example.com', password='secret', is_staff=True
+        )
+        self.assertEqual(
+            self.client.get(reverse('metrics'), HTTP_AUTHORIZATION='Bearer scrape-token').status_code, 200
+        )
+        self.assertEqual(self.client.get(reverse('metrics'), REMOTE_ADDR='10.0.0.5').status_code, 200)
+        self.client.force_login(staff)
+        self.assertEqual(self.client.get(reverse('metrics')).status_code, 200)
+
+
+class SimulateGamesTests(SimpleTestCase):
+    def test_rejects_an_empty_run(self):
+        with self.assertRaisesMessage(CommandError, "--games must be at least 1."):
+            call_command('simulate_games', '--games', '0', stdout=StringIO())
+
+
+class OpeningBookTests(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = f"{directory.name}/opening_book.bin"
+        patcher = mock.patch.multiple(opening_book, _book=None, _book_identity=None)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_rebuilt_book_is_picked_up_and_old_maps_stay_readable(self):
+        with override_settings(OPENING_BOOK_PATH=self.path):
+            self.assertIsNone(opening_book.get_opening_book())
+            opening_book.build_opening_book(self.path, max_ply=1, depth=1)
+            book = opening_book.get_opening_book()
+            self.assertIs(opening_book.get_opening_book(), book)
+
+            opening_book.build_opening_book(self.path, max_ply=0, depth=1)
+            rebuilt = opening_book.get_opening_book()
+
+        self.assertIsNot(rebuilt, book)
+        self.assertEqual(len(rebuilt), 1)
+        self.assertIsNotNone(book.lookup(Position.from_moves([(0, 0)])))
+        self.assertIsNone(rebuilt.lookup(Position.from_moves([(0, 0)])))
+
+
+class ProfilingTests(TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+
+    def profiling(self, **config):
+        return override_settings(PROFILING={'ENABLED': True, 'DIRECTORY': self.directory, **config})
+
+    def reports(self):
+        return sorted(name for name in os.listdir(self.directory) if name.endswith('.json'))
+
+    def test_store_keeps_only_the_newest_reports(self):
+        store = ProfileStore(self.directory, max_profiles=2)
+        for index in range(3):
+            store.save({'index': index})
+
+        reports = self.reports()
+        self.assertEqual(len(reports), 2)
+        with open(os.path.join(self.directory, reports[0])) as report_file:
+            self.assertEqual(json.load(report_file)['index'], 1)
+
+    def test_slow_request_is_captured_without_sql_parameters(self):
+        def view(request):
+            CustomUser.objects.filter(email='alice@example.com').exists()
+            return HttpResponse()
+
+        with self.profiling(SLOW_REQUEST_THRESHOLD=0.0):
+            ProfilingMiddleware(view)(RequestFactory().get('/api/games/'))
+
+        [name] = self.reports()
+        with open(os.path.join(self.directory, name)) as report_file:
+            report = json.load(report_file)
+        self.assertEqual(report['trigger'], 'slow')
+        self.assertTrue(report['sql'])
+        self.assertNotIn('alice@example.com', json.dumps(report))
+
+    def test_fast_request_is_not_captured(self):
+        with self.profiling(SLOW_REQUEST_THRESHOLD=60.0):
+            ProfilingMiddleware(lambda request: HttpResponse())(RequestFactory().get('/api/games/'))
+
+        self.assertEqual(self.reports(), [])
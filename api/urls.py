@@ -1,6 +1,7 @@
 from django.urls import path
 from .views import (UserRegistrationView, LoginView, UserGamesView, MoveCreateView, LogoutView, MatchmakingView,
-                    LeaderboardView)
+                    LeaderboardView, UserStatsView, ComputerMoveView, GameEventFeedView,
+                    ComputerGamesView)
 from rest_framework_simplejwt.views import TokenRefreshView
 
 
@@ -12,5 +13,10 @@ urlpatterns = [
     path('games/<int:game_id>/moves/', MoveCreateView.as_view(), name='move-create'),
     path('matchmaking/', MatchmakingView.as_view(), name='matchmaking'),
     path('leaderboard/', LeaderboardView.as_view(), name='leaderboard'),
+    path('stats/', UserStatsView.as_view(), name='user-stats'),
+    path('stats/<str:username>/', UserStatsView.as_view(), name='user-stats-detail'),
+    path('events/', GameEventFeedView.as_view(), name='game-events'),
+    path('computer/games/', ComputerGamesView.as_view(), name='computer-games'),
+    path('computer/move/', ComputerMoveView.as_view(), name='computer-move'),
     path('token/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
 ]
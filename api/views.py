@@ -1,24 +1,52 @@
+import hmac
 from rest_framework import status
 from rest_framework.response import Response
 from rest_framework.views import APIView
 from rest_framework_simplejwt.tokens import RefreshToken
 from rest_framework_simplejwt.token_blacklist.models import OutstandingToken, BlacklistedToken
 from rest_framework.permissions import AllowAny, IsAuthenticated
+from rest_framework.renderers import BrowsableAPIRenderer
+from django.http import HttpResponse, HttpResponseForbidden
+from django.views import View
 from django.db.models import F, Q
 from django.utils.timezone import now, make_aware, is_aware
+from django.utils.http import parse_etags
 from django.db import transaction
+from django.conf import settings
 from datetime import timedelta
-from .models import Game, MatchmakingQueue, CustomUser
+from .models import (Game, MatchmakingQueue, CustomUser, UserStats, GameEvent, ComputerGame, LeaderboardEntry,
+                     VersionCounter)
 from .serializers import (GameSerializer, MoveSerializer, UserRegistrationSerializer, LoginSerializer,
-                          CustomUserSerializer, MatchmakingQueueSerializer)
-from .services import GameService
+                          CustomUserSerializer, MatchmakingQueueSerializer, UserStatsSerializer,
+                          GameEventSerializer, ComputerGameSubmissionSerializer)
+from .services import GameService, VersionService, TIMEOUT_SUFFIX
+from .metrics import registry
+from .engine import Position, best_move, cell_coordinates, cell_index
+from .opening_book import get_opening_book
+from .fast_serializers import serialize_games
+from .renderers import FastJSONRenderer
+from .events import LeaderboardConsumer
+
+
+def etag_matches(request, etag):
+    if_none_match = request.headers.get('If-None-Match')
+    if not if_none_match:
+        return False
+    etags = parse_etags(if_none_match)
+    return '*' in etags or etag in etags
+
+
+def not_modified(etag):
+    return Response(status=status.HTTP_304_NOT_MODIFIED, headers={'ETag': etag})
 
 
 class UserRegistrationView(APIView):
     def post(self, request, format=None):
         serializer = UserRegistrationSerializer(data=request.data)
         if serializer.is_valid():
-            user = serializer.save()
+            # The post_save signal records USER_REGISTERED in the same transaction.
+            with transaction.atomic():
+                user = serializer.save()
 
             refresh = RefreshToken.for_user(user)
             access_token = str(refresh.access_token)
@@ -34,13 +62,14 @@ class UserRegistrationView(APIView):
 
 
 class LoginView(APIView):
+    renderer_classes = [FastJSONRenderer, BrowsableAPIRenderer]
     authentication_classes = []
     permission_classes = [AllowAny, ]
 
     def post(self, request, format=None):
         serializer = LoginSerializer(data=request.data)
         if serializer.is_valid():
-            user = serializer.validate(data=request.data)
+            user = serializer.validated_data
             tokens = serializer.create_tokens(user)
             games_data = serializer.get_user_games(user)
 
@@ -95,10 +124,13 @@ class MatchmakingView(APIView):
                 opponent_entry = MatchmakingQueue.objects.exclude(user=user).filter(time_limit=time_limit).first()
                 if opponent_entry:
                     game = Game.objects.create(player1=opponent_entry.user, player2=user, time_limit=time_limit)
+                    GameEvent.record_match_created(game)
                     opponent_entry.delete()
+                    VersionService.bump_users([opponent_entry.user_id, user.id])
                     return Response(GameSerializer(game).data, status=status.HTTP_201_CREATED)
 
                 queue_entry = MatchmakingQueue.objects.create(user=user, time_limit=timedelta(days=time_limit_days))
+                VersionService.bump_users([user.id])
                 return Response(
                     {
                         "detail": "No opponents available. You have been added to the queue.",
@@ -114,6 +146,10 @@ class MatchmakingView(APIView):
 
     def get(self, request, *args, **kwargs):
         user = request.user
+        etag = f'"matchmaking-{user.id}-{user.data_version}"'
+        if etag_matches(request, etag):
+            return not_modified(etag)
+
         matchmaking_entries = MatchmakingQueue.objects.filter(user=user)
         matchmaking_times = []
         for matchmaking_entry in matchmaking_entries:
@@ -121,7 +157,8 @@ class MatchmakingView(APIView):
 
         return Response(
             {"matchmaking": matchmaking_times},
-            status=status.HTTP_200_OK
+            status=status.HTTP_200_OK,
+            headers={'ETag': etag}
         )
 
     def delete(self, request):
@@ -136,7 +173,9 @@ class MatchmakingView(APIView):
                 status=status.HTTP_400_BAD_REQUEST,
             )
 
-        matchmaking_queue.delete()
+        with transaction.atomic():
+            matchmaking_queue.delete()
+            VersionService.bump_users([user.id])
         return Response(
             {"message": "User removed from matchmaking queue."},
             status=status.HTTP_200_OK,
@@ -144,6 +183,7 @@ class MatchmakingView(APIView):
 
 
 class UserGamesView(APIView):
+    renderer_classes = [FastJSONRenderer, BrowsableAPIRenderer]
     permission_classes = [IsAuthenticated]
 
     def get(self, request, *args, **kwargs):
@@ -169,15 +209,20 @@ class UserGamesView(APIView):
                 winner = game.player1
                 loser = game.player2
 
-            game.winner = f"{winner.username} wins by timeout"
-            game.is_complete = True
-            game.save()
-            GameService.update_ratings(winner, loser, result=1)
+            with transaction.atomic():
+                GameService.complete_game(game, f"{winner.username}{TIMEOUT_SUFFIX}", winner, loser, by_timeout=True)
+                game.save()
+        if timed_out_games:
+            # Completing the games bumped this user's version after it was loaded.
+            user.refresh_from_db(fields=['data_version'])
+
+        etag = f'"games-{user.id}-{user.data_version}"'
+        if etag_matches(request, etag):
+            return not_modified(etag)
 
         sorted_games = user_games.order_by('-updated_at')
 
-        serializer = GameSerializer(sorted_games, many=True)
-        return Response({"games": serializer.data}, status=200)
+        return Response({"games": serialize_games(sorted_games)}, status=200, headers={'ETag': etag})
 
 
 class MoveCreateView(APIView):
@@ -196,13 +241,17 @@ class MoveCreateView(APIView):
             if not (0 <= row < 8) or not (0 <= column < 8):
                 return Response({"detail": "Invalid row or column."}, status=status.HTTP_400_BAD_REQUEST)
 
-            game = Game.objects.get(id=game_id)
-
-            board = GameService.build_board(game)
-            if not GameService.is_valid(board, row, column):
-                return Response({"detail": "Invalid move."}, status=status.HTTP_400_BAD_REQUEST)
+            with transaction.atomic():
+                game = (
+                    Game.objects.select_for_update(of=('self',))
+                    .select_related('player1', 'player2')
+                    .get(id=game_id)
+                )
+                state = GameService.load_state(game)
+                if not state.position.is_legal(cell_index(row, column)):
+                    return Response({"detail": "Invalid move."}, status=status.HTTP_400_BAD_REQUEST)
 
-            move = GameService.make_move(game, user, row, column)
+                move = GameService.make_move(game, user, row, column, state=state)
             return Response(MoveSerializer(move).data, status=status.HTTP_201_CREATED)
         except ValueError as e:
             return Response({"detail": str(e)}, status=status.HTTP_400_BAD_REQUEST)
@@ -211,15 +260,31 @@ class MoveCreateView(APIView):
 
 
 class LeaderboardView(APIView):
+    """
+    Served from the LeaderboardEntry read model, which is updated after every commit that writes a
+    relevant event. While the consumer is behind (after a migration, or stopped at a sequence gap) the
+    users table is read directly instead.
+    """
+    renderer_classes = [FastJSONRenderer, BrowsableAPIRenderer]
+
     def get(self, request, *args, **kwargs):
+        pending = LeaderboardConsumer().latest_pending()
+        version = VersionService.get(VersionCounter.LEADERBOARD)
+        if pending is None:
+            source, etag = LeaderboardEntry.objects, f'"leaderboard-{version}"'
+        else:
+            source, etag = CustomUser.objects, f'"leaderboard-{version}-{pending}"'
+        if etag_matches(request, etag):
+            return not_modified(etag)
+
         computer_points_leaderboard = (
-            CustomUser.objects.all()
+            source.all()
             .order_by('-computer_points')
             .values('username', 'computer_points')
         )
 
         online_rating_leaderboard = (
-            CustomUser.objects.all()
+            source.all()
             .order_by('-online_rating')
             .values('username', 'online_rating')
         )
@@ -228,4 +293,174 @@ class LeaderboardView(APIView):
             "computer_points_leaderboard": list(computer_points_leaderboard),
             "online_rating_leaderboard": list(online_rating_leaderboard),
         }
-        return Response(response_data, status=200)
+        return Response(response_data, status=200, headers={'ETag': etag})
+
+
+class UserStatsView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, username=None, *args, **kwargs):
+        if username is None:
+            user = request.user
+        else:
+            try:
+                user = CustomUser.objects.get(username=username)
+            except CustomUser.DoesNotExist:
+                return Response({"detail": "User not found."}, status=status.HTTP_404_NOT_FOUND)
+
+        try:
+            stats = UserStats.objects.get(user=user)
+        except UserStats.DoesNotExist:
+            stats = UserStats(user=user, rating_peak=user.online_rating)
+        return Response(UserStatsSerializer(stats).data, status=status.HTTP_200_OK)
+
+
+class ComputerMoveView(APIView):
+    """
+    Suggests a move for the side to play, for the computer opponent and for hints. Early positions are
+    answered from the opening book; later ones fall back to a bounded search.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request, *args, **kwargs):
+        if not isinstance(request.data, dict):
+            return Response({"detail": "Expected an object with moves."}, status=status.HTTP_400_BAD_REQUEST)
+        moves = request.data.get('moves', [])
+        try:
+            depth = min(int(request.data.get('depth', settings.COMPUTER_MAX_DEPTH)), settings.COMPUTER_MAX_DEPTH)
+            position = Position.from_moves((int(row), int(column)) for row, column in moves)
+        except (TypeError, ValueError) as e:
+            return Response({"detail": f"Invalid moves: {e}"}, status=status.HTTP_400_BAD_REQUEST)
+        if position.is_over:
+            return Response({"detail": "The game is already over."}, status=status.HTTP_400_BAD_REQUEST)
+
+        book = get_opening_book()
+        entry = book.lookup(position) if book is not None else None
+        if entry is not None:
+            cell, score = entry
+            source = "book"
+        else:
+            cell, score = best_move(position, depth)
+            source = "search"
+
+        row, column = cell_coordinates(cell)
+        return Response({"row": row, "column": column, "score": score, "source": source}, status=status.HTTP_200_OK)
+
+
+class ComputerGamesView(APIView):
+    """
+    Records completed games against the computer: one game, or a batch played offline sent either as
+    {"games": [...]} or as a bare list.
+    Each game is replayed to check the placement rule and the result before its points are credited.
+    Invalid games are reported without affecting the rest; games already recorded (same id) are skipped.
+    """
+    permission_classes = [IsAuthenticated]
+    MAX_GAMES = 500
+
+    def post(self, request, *args, **kwargs):
+        if isinstance(request.data, list):
+            submitted = request.data
+        elif isinstance(request.data, dict):
+            submitted = request.data.get('games', [request.data])
+        else:
+            submitted = None
+        if not isinstance(submitted, list) or len(submitted) > self.MAX_GAMES:
+            return Response(
+                {"detail": f"games must be a list of at most {self.MAX_GAMES} games."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        valid, rejected = {}, []
+        for index, data in enumerate(submitted):
+            serializer = ComputerGameSubmissionSerializer(data=data)
+            if serializer.is_valid():
+                valid.setdefault(serializer.validated_data['id'], serializer.validated_data)
+            else:
+                rejected.append({"index": index, "errors": serializer.errors})
+
+        user = request.user
+        with transaction.atomic():
+            # Serializes concurrent submissions by the same user so a game id is only credited once.
+            CustomUser.objects.select_for_update().filter(id=user.id).first()
+            recorded = set(
+                ComputerGame.objects.filter(user=user, client_id__in=valid.keys()).values_list('client_id', flat=True)
+            )
+            new_games = [
+                ComputerGame(
+                    user=user,
+                    client_id=client_id,
+                    packed_moves=game['packed_moves'],
+                    human_first=game['human_first'],
+                    difficulty=game['difficulty'],
+                    human_won=game['human_won'],
+                    points=game['points'],
+                )
+                for client_id, game in valid.items() if client_id not in recorded
+            ]
+            ComputerGame.objects.bulk_create(new_games)
+            points = sum(game.points for game in new_games)
+            if points:
+                CustomUser.objects.filter(id=user.id).update(computer_points=F('computer_points') + points)
+                VersionService.bump_users([user.id], include_opponents=True)
+            computer_points = CustomUser.objects.values_list('computer_points', flat=True).get(id=user.id)
+            if points:
+                GameEvent.record(
+                    GameEvent.COMPUTER_POINTS_CHANGED,
+                    user=user,
+                    old_points=computer_points - points,
+                    new_points=computer_points,
+                )
+
+        return Response({
+            "accepted": len(new_games),
+            "duplicates": len(valid) - len(new_games),
+            "rejected": rejected,
+            "points_awarded": points,
+            "computer_points": computer_points,
+        }, status=status.HTTP_200_OK)
+
+
+class GameEventFeedView(APIView):
+    """
+    Change feed of events for the requesting user's games, oldest first. Clients pass the last
+    sequence they have seen as `after` to receive only newer events.
+    """
+    permission_classes = [IsAuthenticated]
+    MAX_LIMIT = 500
+
+    def get(self, request, *args, **kwargs):
+        try:
+            after = int(request.query_params.get('after', 0))
+            limit = min(int(request.query_params.get('limit', 100)), self.MAX_LIMIT)
+        except ValueError:
+            return Response({"detail": "after and limit must be integers."}, status=status.HTTP_400_BAD_REQUEST)
+        if limit < 1:
+            return Response({"detail": "limit must be at least 1."}, status=status.HTTP_400_BAD_REQUEST)
+
+        user = request.user
+        events = list(
+            GameEvent.objects.filter(Q(game__player1=user) | Q(game__player2=user), sequence__gt=after)
+            .order_by('sequence')[:limit]
+        )
+        return Response({
+            "events": GameEventSerializer(events, many=True).data,
+            "last_sequence": events[-1].sequence if events else after,
+        }, status=status.HTTP_200_OK)
+
+
+class MetricsView(View):
+    def get(self, request, *args, **kwargs):
+        if not self.is_allowed(request):
+            return HttpResponseForbidden()
+        return HttpResponse(registry.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+    @staticmethod
+    def is_allowed(request):
+        config = getattr(settings, 'METRICS', {})
+        if request.META.get('REMOTE_ADDR') in config.get('ALLOWED_IPS', ()):
+            return True
+        token = config.get('TOKEN')
+        authorization = request.headers.get('Authorization', '')
+        if token and hmac.compare_digest(authorization.encode(), f"Bearer {token}".encode()):
+            return True
+        return request.user.is_authenticated and request.user.is_staff